@@ -0,0 +1,132 @@
+# app/cache.py
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional
+
+
+class TTLCache:
+    """Cache LRU borné avec expiration, avec compteurs pour le dimensionnement"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def values(self) -> List[Any]:
+        """Valeurs encore valides, sans compter de succès ni d'échec"""
+        now = time.monotonic()
+        return [value for expires_at, value in self._data.values() if expires_at > now]
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Produits unitaires, indexés par id
+product_cache = TTLCache(
+    maxsize=int(os.getenv("PRODUCT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PRODUCT_CACHE_TTL", "30")),
+)
+
+# Pages de la liste, indexées par (curseur, limite, filtres)
+page_cache = TTLCache(
+    maxsize=int(os.getenv("PRODUCT_PAGE_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("PRODUCT_PAGE_CACHE_TTL", "10")),
+)
+
+
+# Autres vues dérivées des produits, prévenues à chaque invalidation
+_listeners: List[Callable[[Optional[int]], None]] = []
+
+# Horloge monotone de la dernière invalidation (écriture locale)
+_last_invalidation = float("-inf")
+# Incrémenté à chaque invalidation : une lecture commencée avant ne doit pas
+# remettre en cache une valeur devenue périmée entre-temps
+_generation = 0
+
+
+def generation() -> int:
+    """Numéro d'invalidation courant, à relire avant de mettre en cache"""
+    return _generation
+
+
+def invalidated_within(seconds: float) -> bool:
+    """Vrai si une invalidation a eu lieu il y a moins de seconds secondes"""
+    return time.monotonic() - _last_invalidation < seconds
+
+
+def on_invalidate(listener: Callable[[Optional[int]], None]):
+    """Enregistre un rappel appelé avec l'id invalidé (None : tous les produits)"""
+    _listeners.append(listener)
+
+
+def invalidate_product(product_id: Optional[int] = None):
+    """Invalide un produit et toutes les pages de liste (qui peuvent le contenir)"""
+    global _last_invalidation, _generation
+    _last_invalidation = time.monotonic()
+    _generation += 1
+    if product_id is not None:
+        product_cache.invalidate(product_id)
+    page_cache.clear()
+    for listener in _listeners:
+        listener(product_id)
+
+
+def clear_caches():
+    global _last_invalidation, _generation
+    _last_invalidation = time.monotonic()
+    _generation += 1
+    product_cache.clear()
+    page_cache.clear()
+    for listener in _listeners:
+        listener(None)
+
+
+def cache_stats() -> dict:
+    return {"products": product_cache.stats(), "pages": page_cache.stats()}
@@ -0,0 +1,158 @@
+# app/catalog.py
+import asyncio
+import gzip
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.cache import on_invalidate
+from app.models import ProductModel
+from app.serialization import PRODUCT_COLUMNS, product_row, dumps
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : gzip seul sinon
+    brotli = None
+
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+class CatalogSnapshot:
+    """Catalogue complet matérialisé en mémoire, déjà sérialisé et compressé
+
+    Chaque produit est gardé sous forme de fragment JSON. Une écriture ou un
+    événement product.* marque seulement l'id concerné : la reconstruction
+    suivante ne relit que ces produits, réassemble le corps puis recalcule
+    les variantes gzip/brotli et l'ETag fort. Entre deux écritures, les
+    requêtes sont servies depuis ces octets sans toucher la base.
+
+    L'assemblage et la compression (plusieurs centaines de millisecondes
+    pour 100 000 produits) tournent dans un thread, hors de la boucle
+    d'événements ; zlib et brotli relâchent le GIL pendant la compression.
+    """
+
+    def __init__(self):
+        self._fragments: Dict[int, bytes] = {}
+        self._dirty: Set[int] = set()
+        self._stale = True
+        self._lock = asyncio.Lock()
+
+        self.body = b"[]"
+        self.variants: Dict[str, bytes] = {}
+        self.etag: Optional[str] = None
+
+        self.full_builds = 0
+        self.incremental_builds = 0
+        self.served = 0
+        self.not_modified = 0
+
+    def invalidate(self, product_id: Optional[int] = None):
+        if product_id is None:
+            self._stale = True
+        else:
+            self._dirty.add(product_id)
+
+    @property
+    def fresh(self) -> bool:
+        return not self._stale and not self._dirty
+
+    async def get(self, session_factory) -> "CatalogSnapshot":
+        """Renvoie le snapshot, reconstruit au besoin (une seule reconstruction à la fois)"""
+        if self.fresh:
+            return self
+        async with self._lock:
+            if self._stale:
+                await self._build_full(session_factory)
+            elif self._dirty:
+                await self._build_incremental(session_factory)
+        return self
+
+    async def _build_full(self, session_factory):
+        # Les invalidations arrivées pendant la lecture restent à traiter
+        self._stale = False
+        self._dirty.clear()
+        fragments = {}
+        async with session_factory() as db:
+            result = await db.stream(
+                select(*PRODUCT_COLUMNS)
+                .order_by(ProductModel.id)
+                .execution_options(yield_per=SNAPSHOT_BATCH_SIZE)
+            )
+            async for row in result:
+                fragments[row.id] = _fragment(row)
+        self._fragments = fragments
+        self.full_builds += 1
+        await self._assemble()
+
+    async def _build_incremental(self, session_factory):
+        ids = sorted(self._dirty)
+        self._dirty.clear()
+        async with session_factory() as db:
+            rows = await db.execute(
+                select(*PRODUCT_COLUMNS).where(
+                    ProductModel.id == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+                )
+            )
+            found = {row.id: _fragment(row) for row in rows}
+        for product_id in ids:
+            if product_id in found:
+                self._fragments[product_id] = found[product_id]
+            else:
+                self._fragments.pop(product_id, None)
+        self.incremental_builds += 1
+        await self._assemble()
+
+    async def _assemble(self):
+        # Appelé sous self._lock : les fragments ne changent pas entre-temps
+        body, variants, etag = await asyncio.to_thread(_encode, self._fragments)
+        # Les trois champs changent ensemble, entre deux requêtes servies
+        self.body, self.variants, self.etag = body, variants, etag
+
+    def encoded(self, accept_encoding: str):
+        """Corps et Content-Encoding adaptés à l'en-tête Accept-Encoding"""
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in (accept_encoding or "").split(",")
+        }
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in self.variants:
+                return self.variants[encoding], encoding
+        return self.body, None
+
+    def stats(self) -> dict:
+        return {
+            "products": len(self._fragments),
+            "bytes": len(self.body),
+            "compressed_bytes": {k: len(v) for k, v in self.variants.items()},
+            "etag": self.etag,
+            "fresh": self.fresh,
+            "dirty": len(self._dirty),
+            "full_builds": self.full_builds,
+            "incremental_builds": self.incremental_builds,
+            "served": self.served,
+            "not_modified": self.not_modified,
+        }
+
+
+def _fragment(row) -> bytes:
+    return dumps(product_row(row))
+
+
+def _ordered(fragments: Dict[int, bytes]) -> List[bytes]:
+    return [fragments[product_id] for product_id in sorted(fragments)]
+
+
+def _encode(fragments: Dict[int, bytes]) -> Tuple[bytes, Dict[str, bytes], str]:
+    """Corps JSON, variantes compressées et ETag fort (exécuté dans un thread)"""
+    body = b"[" + b",".join(_ordered(fragments)) + b"]"
+    variants = {"gzip": gzip.compress(body, compresslevel=6)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=5)
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return body, variants, etag
+
+
+catalog_snapshot = CatalogSnapshot()
+on_invalidate(catalog_snapshot.invalidate)
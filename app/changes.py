@@ -0,0 +1,73 @@
+# app/changes.py
+from typing import Any, Dict
+
+from sqlalchemy import event, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models import ProductChangeModel, product_changes_seq
+from app.messaging.events import (
+    PRODUCT_CREATED,
+    PRODUCT_UPDATED,
+    PRODUCT_DELETED,
+    PRODUCT_STOCK_CHANGED,
+    PRODUCT_STOCK_RESERVED,
+    PRODUCT_STOCK_RELEASED,
+)
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Événements qui modifient des produits et opération correspondante du journal
+CHANGE_OPS = {
+    PRODUCT_CREATED: UPSERT,
+    PRODUCT_UPDATED: UPSERT,
+    PRODUCT_STOCK_CHANGED: UPSERT,
+    PRODUCT_STOCK_RESERVED: UPSERT,
+    PRODUCT_STOCK_RELEASED: UPSERT,
+    PRODUCT_DELETED: DELETE,
+}
+
+
+def track_changes(db, event_type: str, data: Dict[str, Any]):
+    """Note les produits touchés par un événement, écrits au commit de la session"""
+    op = CHANGE_OPS.get(event_type)
+    if op is None:
+        return
+    changes = db.info.setdefault("product_changes", {})
+    if data.get("product_id") is not None:
+        changes[data["product_id"]] = op
+    # Réservations / libérations : plusieurs produits par événement
+    for line in data.get("lines", []):
+        changes[line["product_id"]] = op
+
+
+@event.listens_for(Session, "before_commit")
+def _write_changes(session):
+    """Un seul INSERT ... ON CONFLICT pour tous les produits de la transaction"""
+    changes = session.info.pop("product_changes", None)
+    if not changes:
+        return
+    stmt = insert(ProductChangeModel).values(
+        [
+            {"product_id": product_id, "op": op}
+            for product_id, op in sorted(changes.items())
+        ]
+    )
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ProductChangeModel.product_id],
+            set_={
+                "op": stmt.excluded.op,
+                "seq": product_changes_seq.next_value(),
+                "changed_at": func.clock_timestamp(),
+            },
+        )
+    )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_changes(session, transaction):
+    # Transaction principale terminée sans commit (un savepoint ne compte pas)
+    if transaction.parent is None:
+        session.info.pop("product_changes", None)
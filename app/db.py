@@ -1,23 +1,133 @@
 import os
-from sqlalchemy import create_engine
+import math
+import time
+from fastapi import Depends, Request, Response
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
+from app.pool import MonitoredQueuePool, PoolMonitor, watch
+
 load_dotenv()
 
 Base = declarative_base()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Réplica en lecture (streaming replication) ; sans valeur tout passe par le primaire
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+
+# Réglages du pool, identiques pour le primaire et le réplica
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Après une écriture, le client lit sur le primaire pendant ce délai
+READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "db_primary_until"
+
+
+def to_async_url(url: str):
+    """Convertit une URL postgresql:// synchrone vers le driver asyncpg"""
+    return make_url(url).set(drivername="postgresql+asyncpg")
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
 
+def create_pooled_engine(url, monitor: PoolMonitor):
+    """Moteur asynchrone au pool dimensionné, vérifié et mesuré"""
+    engine = create_async_engine(
+        url,
+        poolclass=MonitoredQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    watch(engine.sync_engine.pool, monitor)
+    return engine
+
+
+# Moteur synchrone : gestion du schéma et scripts hors requêtes HTTP
 engine = create_engine(
     DATABASE_URL,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
 )
 SessionLocal = sessionmaker(bind=engine)
 
+# Moteur asynchrone utilisé par les routes : ne bloque pas la boucle d'événements
+primary_pool = PoolMonitor("primary")
+async_engine = create_pooled_engine(ASYNC_DATABASE_URL, primary_pool)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+if DATABASE_READ_URL:
+    replica_pool = PoolMonitor("replica")
+    read_engine = create_pooled_engine(to_async_url(DATABASE_READ_URL), replica_pool)
+    AsyncReadSessionLocal = async_sessionmaker(bind=read_engine, expire_on_commit=False)
+else:
+    replica_pool = None
+    read_engine = async_engine
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 
-def get_db():
-    db = SessionLocal()
+def get_session_factory():
+    """Fabrique de sessions pour les traitements qui dépassent la durée de la requête"""
+    return AsyncSessionLocal
+
+
+def replica_enabled() -> bool:
+    return AsyncReadSessionLocal is not AsyncSessionLocal
+
+
+def reads_replica(session_factory) -> bool:
+    """Vrai si la fabrique lit sur le réplica (données éventuellement en retard)"""
+    return replica_enabled() and session_factory is AsyncReadSessionLocal
+
+
+def reads_from_primary(request: Request) -> bool:
+    """Vrai si le client a écrit récemment (cookie read-your-writes encore valide)"""
     try:
+        until = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0))
+    except ValueError:
+        return False
+    return until > time.time()
+
+
+def get_read_session_factory(request: Request):
+    """Fabrique de sessions des lectures : réplica, sauf juste après une écriture"""
+    if not replica_enabled() or reads_from_primary(request):
+        return AsyncSessionLocal
+    return AsyncReadSessionLocal
+
+
+async def get_read_db(session_factory=Depends(get_read_session_factory)):
+    async with session_factory() as db:
         yield db
-    finally:
-        db.close()
+
+
+def stick_to_primary(response: Response):
+    """Dirige les lectures suivantes du client vers le primaire (read-your-writes)"""
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE,
+        f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}",
+        max_age=math.ceil(READ_YOUR_WRITES_SECONDS),
+        httponly=True,
+        samesite="lax",
+    )
+
+
+def pool_stats() -> dict:
+    return {
+        "primary": primary_pool.stats(),
+        "replica": replica_pool.stats() if replica_pool else None,
+    }
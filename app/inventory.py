@@ -0,0 +1,214 @@
+# app/inventory.py
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Set
+
+from sqlalchemy import Integer, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models import ProductModel, StockReservationModel, version_bump
+from app.messaging.events import (
+    PRODUCT_STOCK_RESERVED,
+    PRODUCT_STOCK_RESERVATION_FAILED,
+    PRODUCT_STOCK_RELEASED,
+)
+from app.messaging.outbox import add_outbox_event
+
+RESERVED = "reserved"
+RELEASED = "released"
+
+
+def order_lines(order_data: Dict[str, Any]) -> Dict[int, int]:
+    """Quantités par produit d'une commande, les lignes en double sont cumulées
+
+    Accepte order_data["products"] ou order_data["items"], chaque ligne
+    portant product_id et quantity (1 par défaut).
+    """
+    quantities = Counter()
+    for line in order_data.get("products") or order_data.get("items") or []:
+        product_id = line.get("product_id")
+        quantity = int(line.get("quantity", 1))
+        if product_id is None or quantity <= 0:
+            continue
+        quantities[int(product_id)] += quantity
+    return dict(quantities)
+
+
+def _lines(quantities: Dict[int, int]):
+    """Lignes de commande sous forme de table VALUES pour un UPDATE ... FROM"""
+    return values(
+        column("product_id", Integer), column("quantity", Integer), name="lines"
+    ).data(sorted(quantities.items()))
+
+
+async def lock_products(db, product_ids: Iterable[int]):
+    """Verrouille les produits dans l'ordre des id
+
+    Les verrous durent jusqu'à la fin de la transaction : un lot de
+    commandes doit verrouiller en une fois l'union de leurs produits, sinon
+    deux lots concurrents peuvent les prendre dans des ordres opposés.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return
+    await db.execute(
+        select(ProductModel.id)
+        .where(ProductModel.id.in_(product_ids))
+        .order_by(ProductModel.id)
+        .with_for_update()
+    )
+
+
+async def reserved_product_ids(db, order_ids: Iterable[Any]) -> Set[int]:
+    """Produits des réservations actives de ces commandes"""
+    return set(
+        await db.scalars(
+            select(StockReservationModel.product_id)
+            .where(StockReservationModel.order_id.in_([str(o) for o in order_ids]))
+            .where(StockReservationModel.status == RESERVED)
+        )
+    )
+
+
+async def reserve_order_stock(
+    db, order_id: Any, quantities: Dict[int, int]
+) -> Optional[bool]:
+    """Réserve le stock de toutes les lignes d'une commande, tout ou rien
+
+    Le nombre d'instructions ne dépend pas du nombre de lignes. Renvoie
+    True/False selon le résultat (l'événement correspondant est ajouté à
+    l'outbox), ou None si la commande est vide, sans identifiant ou déjà
+    réservée.
+    """
+    if order_id is None or not quantities:
+        return None
+
+    savepoint = await db.begin_nested()
+
+    # Les réservations d'abord : la contrainte unique rend l'opération idempotente
+    inserted = (
+        await db.scalars(
+            insert(StockReservationModel)
+            .values(
+                [
+                    {
+                        "order_id": str(order_id),
+                        "product_id": product_id,
+                        "quantity": quantity,
+                        "status": RESERVED,
+                    }
+                    for product_id, quantity in quantities.items()
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["order_id", "product_id"])
+            .returning(StockReservationModel.product_id)
+        )
+    ).all()
+    if len(inserted) < len(quantities):
+        await savepoint.rollback()
+        return None
+
+    await lock_products(db, quantities)
+    lines = _lines(quantities)
+    updated = (
+        await db.execute(
+            update(ProductModel)
+            .where(ProductModel.id == lines.c.product_id)
+            .where(ProductModel.stock >= lines.c.quantity)
+            .values(stock=ProductModel.stock - lines.c.quantity, **version_bump())
+            .returning(ProductModel.id, ProductModel.stock)
+            .execution_options(synchronize_session=False)
+        )
+    ).all()
+
+    if len(updated) < len(quantities):
+        await savepoint.rollback()
+        reserved_ids = {row.id for row in updated}
+        add_outbox_event(
+            db,
+            PRODUCT_STOCK_RESERVATION_FAILED,
+            {
+                "order_id": order_id,
+                "failed_product_ids": sorted(set(quantities) - reserved_ids),
+                "lines": [
+                    {"product_id": product_id, "quantity": quantity}
+                    for product_id, quantity in sorted(quantities.items())
+                ],
+            },
+        )
+        return False
+
+    await savepoint.commit()
+    stock = {row.id: row.stock for row in updated}
+    add_outbox_event(
+        db,
+        PRODUCT_STOCK_RESERVED,
+        {
+            "order_id": order_id,
+            "lines": [
+                {
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "stock": stock[product_id],
+                }
+                for product_id, quantity in sorted(quantities.items())
+            ],
+        },
+    )
+    return True
+
+
+async def release_order_stock(db, order_id: Any) -> Optional[Dict[int, int]]:
+    """Libère les réservations actives d'une commande annulée
+
+    Renvoie les quantités remises en stock, ou None s'il n'y avait rien à
+    libérer (commande inconnue, échouée ou déjà annulée).
+    """
+    if order_id is None:
+        return None
+    released = (
+        await db.execute(
+            update(StockReservationModel)
+            .where(StockReservationModel.order_id == str(order_id))
+            .where(StockReservationModel.status == RESERVED)
+            .values(status=RELEASED, released_at=datetime.now(timezone.utc))
+            .returning(StockReservationModel.product_id, StockReservationModel.quantity)
+            .execution_options(synchronize_session=False)
+        )
+    ).all()
+    if not released:
+        return None
+
+    quantities = {row.product_id: row.quantity for row in released}
+    await lock_products(db, quantities)
+    lines = _lines(quantities)
+    updated = (
+        await db.execute(
+            update(ProductModel)
+            .where(ProductModel.id == lines.c.product_id)
+            .values(
+                stock=func.coalesce(ProductModel.stock, 0) + lines.c.quantity,
+                **version_bump(),
+            )
+            .returning(ProductModel.id, ProductModel.stock)
+            .execution_options(synchronize_session=False)
+        )
+    ).all()
+
+    stock = {row.id: row.stock for row in updated}
+    add_outbox_event(
+        db,
+        PRODUCT_STOCK_RELEASED,
+        {
+            "order_id": order_id,
+            "lines": [
+                {
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "stock": stock.get(product_id),
+                }
+                for product_id, quantity in sorted(quantities.items())
+            ],
+        },
+    )
+    return quantities
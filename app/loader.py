@@ -0,0 +1,116 @@
+# app/loader.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+# fetch(session_factory, clés) -> {clé: valeur} ; les clés absentes valent None
+Fetch = Callable[[Any, List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class BatchLoader:
+    """Coalescence des lectures concurrentes : single-flight et micro-lots
+
+    Une lecture déjà en vol pour une clé est partagée par tous les appelants
+    concurrents. Les clés nouvelles sont accumulées pendant window secondes
+    (ou jusqu'à max_batch clés) puis chargées ensemble par un seul appel à
+    fetch, donc une seule requête SQL.
+    """
+
+    def __init__(self, fetch: Fetch, window: float = 0.002, max_batch: int = 100):
+        self.fetch = fetch
+        self.window = window
+        self.max_batch = max_batch
+        # Lectures en vol par (fabrique de sessions, clé) : une lecture sur le
+        # primaire n'attend jamais le résultat d'une lecture sur le réplica
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+        # Clés en attente de lot, regroupées par fabrique de sessions
+        self._pending: Dict[Any, Dict[Hashable, asyncio.Future]] = {}
+        self._timers: Dict[Any, asyncio.TimerHandle] = {}
+        # Référence forte aux lots en cours : une tâche sans référence peut
+        # être récupérée par le ramasse-miettes avant la fin
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.loaded_keys = 0
+
+    async def load(self, key: Hashable, session_factory) -> Optional[Any]:
+        self.requests += 1
+        future = self._in_flight.get((session_factory, key))
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[(session_factory, key)] = future
+            pending = self._pending.setdefault(session_factory, {})
+            pending[key] = future
+            if len(pending) >= self.max_batch:
+                self._flush(session_factory)
+            elif len(pending) == 1:
+                self._timers[session_factory] = asyncio.get_running_loop().call_later(
+                    self.window, self._flush, session_factory
+                )
+        # shield : un client qui abandonne n'annule pas la lecture des autres
+        return await asyncio.shield(future)
+
+    def forget(self, key: Optional[Hashable] = None):
+        """Détache les lectures en vol d'une clé (toutes pour None)
+
+        À appeler à l'invalidation : une lecture lancée avant l'écriture peut
+        renvoyer l'ancienne valeur, les appelants suivants en relancent une.
+        Ses appelants actuels reçoivent quand même son résultat. Une clé
+        encore en attente de lot n'est pas lue : elle reste partagée.
+        """
+        for session_factory, in_flight_key in list(self._in_flight):
+            if key is not None and in_flight_key != key:
+                continue
+            if in_flight_key in self._pending.get(session_factory, ()):
+                continue
+            del self._in_flight[(session_factory, in_flight_key)]
+
+    def _flush(self, session_factory):
+        timer = self._timers.pop(session_factory, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(session_factory, None)
+        if batch:
+            task = asyncio.ensure_future(self._run(session_factory, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, session_factory, batch: Dict[Hashable, asyncio.Future]):
+        self.batches += 1
+        self.loaded_keys += len(batch)
+        try:
+            values = await self.fetch(session_factory, list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(values.get(key))
+        finally:
+            for key, future in batch.items():
+                if self._in_flight.get((session_factory, key)) is future:
+                    del self._in_flight[(session_factory, key)]
+            # Exception non récupérée si plus aucun appelant n'attend
+            for future in batch.values():
+                if future.done() and not future.cancelled():
+                    future.exception()
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "in_flight": len(self._in_flight),
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "loaded_keys": self.loaded_keys,
+            # Lectures servies par requête SQL : 1.0 sans aucune coalescence
+            "coalescing_ratio": (
+                round(self.requests / self.batches, 3) if self.batches else None
+            ),
+        }
@@ -0,0 +1,196 @@
+# app/log.py
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+import orjson
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# "clé=taux" séparés par des virgules, ex. broker.published=0.01
+LOG_SAMPLE_RATES = os.getenv(
+    "LOG_SAMPLE_RATES", "broker.published=0.01,consumer.received=0.01"
+)
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Identifiant de corrélation : X-Request-ID en HTTP, event_id côté événements
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+# Attributs standard d'un LogRecord : tout le reste vient de extra=
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+@contextmanager
+def correlation(value: Optional[str]):
+    """Rattache les journaux émis dans le bloc à un identifiant (event_id...)"""
+    token = correlation_id.set(value)
+    try:
+        yield
+    finally:
+        correlation_id.reset(token)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    rates = {}
+    for item in spec.split(","):
+        key, _, rate = item.partition("=")
+        if key.strip() and rate.strip():
+            rates[key.strip()] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Ne garde qu'une fraction des journaux marqués extra={"sample": clé}
+
+    Les avertissements et erreurs ne sont jamais écartés.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample", None)
+        if key is None or record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(key, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class CorrelationFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "correlation_id", None) is None:
+            record.correlation_id = correlation_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par journal, champs extra= compris"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, option=orjson.OPT_UTC_Z, default=str).decode()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Met le journal en file sans jamais attendre : file pleine, il est perdu
+
+    Le formatage et l'écriture sur stdout se font dans le thread du
+    QueueListener, hors de la boucle d'événements.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # File en mémoire : pas de sérialisation, on fige seulement les arguments
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def configure_logging(stream=None):
+    """Installe le pipeline asynchrone sur le logger "app" (idempotent)"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+        )
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+    _handler.addFilter(CorrelationFilter())
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+    logger = logging.getLogger("app")
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+
+def shutdown_logging():
+    """Vide la file puis arrête le thread d'écriture"""
+    global _listener, _handler
+    if _listener is None:
+        return
+    logging.getLogger("app").removeHandler(_handler)
+    _listener.stop()
+    _listener = None
+    _handler = None
+
+
+def logging_stats() -> dict:
+    if _handler is None:
+        return {"configured": False}
+    return {
+        "configured": True,
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+    }
+
+
+class RequestIdMiddleware:
+    """Middleware ASGI : X-Request-ID reçu (ou généré) comme identifiant de corrélation"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        with correlation(request_id):
+            await self.app(scope, receive, send_with_id)
@@ -7,6 +7,10 @@ __all__ = [
     "PRODUCT_CREATED",
     "PRODUCT_UPDATED",
     "PRODUCT_DELETED",
+    "PRODUCT_STOCK_CHANGED",
+    "PRODUCT_STOCK_RESERVED",
+    "PRODUCT_STOCK_RESERVATION_FAILED",
+    "PRODUCT_STOCK_RELEASED",
     "CUSTOMER_CREATED",
     "CUSTOMER_UPDATED",
     "CUSTOMER_DELETED",
@@ -1,28 +1,71 @@
 # app/messaging/broker.py
 import aio_pika
-import json
-from typing import Dict, Any, List, Callable
+import logging
+import orjson
+import time
+from collections import deque
+from decimal import Decimal
+from typing import Dict, Any, Awaitable, Iterable, List, Callable, Optional
 import uuid
 from datetime import datetime, timezone
 import asyncio
 
+from app.metrics import BROKER_PUBLISH_DURATION, BROKER_PUBLISH_ERRORS
+
+EVENTS_EXCHANGE = "payetonkawa.events"
+
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type {type(value).__name__} is not JSON serializable")
+
+
+def encode_event(message_body: Dict[str, Any]) -> bytes:
+    """Sérialise un événement en JSON UTF-8 (orjson)"""
+    return orjson.dumps(message_body, default=_json_default)
+
 
 class MessageBroker:
     """Client pour la communication via message broker (RabbitMQ)"""
 
-    def __init__(self, connection_url: str, service_name: str):
+    def __init__(
+        self,
+        connection_url: str,
+        service_name: str,
+        publish_channels: int = 4,
+        max_in_flight: int = 1000,
+    ):
         self.connection_url = connection_url
         self.service_name = service_name
+        self.publish_channels = publish_channels
+        self.max_in_flight = max_in_flight
         self.connection = None
         self.channel = None
         self.events_exchange = None
 
+        # Pool de canaux en mode confirm dédiés à la publication
+        self._publish_exchanges = []
+        self._next_exchange = 0
+        self._in_flight = None
+        self._latencies = deque(maxlen=4096)
+        self.published = 0
+        self.publish_errors = 0
+
+        self._supervisor: Optional[asyncio.Task] = None
+        self.connections = 0
+        self.connect_failures = 0
+
     async def connect(self, max_retries: int = 5, retry_delay: float = 2.0):
         """Établit la connexion avec RabbitMQ avec retry logic"""
         for attempt in range(max_retries):
             try:
-                print(
-                    f"Attempting RabbitMQ connection (attempt {attempt + 1}/{max_retries})"
+                logger.info(
+                    "Attempting RabbitMQ connection (attempt %d/%d)",
+                    attempt + 1,
+                    max_retries,
                 )
 
                 self.connection = await aio_pika.connect_robust(
@@ -36,83 +79,274 @@ class MessageBroker:
                 await self.channel.set_qos(prefetch_count=10)
 
                 self.events_exchange = await self.channel.declare_exchange(
-                    "payetonkawa.events", aio_pika.ExchangeType.TOPIC, durable=True
+                    EVENTS_EXCHANGE, aio_pika.ExchangeType.TOPIC, durable=True
                 )
 
-                print(f"Message broker connected for service: {self.service_name}")
+                self._publish_exchanges = []
+                for _ in range(self.publish_channels):
+                    channel = await self.connection.channel(publisher_confirms=True)
+                    self._publish_exchanges.append(
+                        await channel.get_exchange(EVENTS_EXCHANGE, ensure=False)
+                    )
+                self._in_flight = asyncio.Semaphore(self.max_in_flight)
+
+                logger.info(
+                    "Message broker connected for service: %s", self.service_name
+                )
                 return
 
             except Exception as e:
-                print(f"Connection attempt {attempt + 1} failed: {str(e)}")
+                logger.warning("Connection attempt %d failed: %s", attempt + 1, e)
 
                 if attempt < max_retries - 1:
-                    print(f"⏳ Retrying in {retry_delay} seconds...")
+                    logger.info("Retrying in %.1f seconds", retry_delay)
                     await asyncio.sleep(retry_delay)
                     retry_delay *= 1.5
                 else:
-                    print(
-                        f"Failed to connect to message broker after {max_retries} attempts"
+                    logger.error(
+                        "Failed to connect to message broker after %d attempts",
+                        max_retries,
                     )
                     raise
 
-    async def publish_event(self, event_type: str, data: Dict[str, Any]):
-        """Publie un événement sur le message broker"""
+    async def publish_event(
+        self,
+        event_type: str,
+        data: Dict[str, Any],
+        event_id: Optional[str] = None,
+        timestamp: Optional[datetime] = None,
+        channel: Optional[int] = None,
+    ):
+        """Publie un événement sur le message broker
+
+        Les canaux sont en mode publisher confirms : l'appel ne rend la main
+        qu'une fois le message confirmé par RabbitMQ. Les appels concurrents
+        sont répartis sur le pool de canaux et restent en vol simultanément,
+        sauf channel imposé (indice dans le pool).
+        """
         if not self.events_exchange:
             raise RuntimeError("Message broker not connected")
 
         message_body = {
             "event_type": event_type,
-            "event_id": str(uuid.uuid4()),
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "event_id": event_id or str(uuid.uuid4()),
+            "timestamp": (timestamp or datetime.now(timezone.utc)).isoformat(),
             "service": self.service_name,
             "data": data,
         }
 
+        message = aio_pika.Message(
+            encode_event(message_body),
+            content_type="application/json",
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            message_id=message_body["event_id"],
+            timestamp=datetime.now(timezone.utc),
+        )
+
+        exchange = self.events_exchange
+        if self._publish_exchanges:
+            if channel is None:
+                channel = self._next_exchange
+                self._next_exchange += 1
+            exchange = self._publish_exchanges[channel % len(self._publish_exchanges)]
+
+        started = time.perf_counter()
         try:
-            message = aio_pika.Message(
-                json.dumps(message_body, ensure_ascii=False).encode("utf-8"),
-                content_type="application/json",
-                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-                message_id=message_body["event_id"],
-                timestamp=datetime.now(timezone.utc),
+            if self._in_flight is not None:
+                async with self._in_flight:
+                    await exchange.publish(message, routing_key=event_type)
+            else:
+                await exchange.publish(message, routing_key=event_type)
+        except Exception as e:
+            self.publish_errors += 1
+            BROKER_PUBLISH_ERRORS.inc(event_type)
+            logger.error(
+                "Failed to publish event %s: %s",
+                event_type,
+                e,
+                extra={"event_type": event_type, "event_id": message_body["event_id"]},
             )
+            raise
 
-            await self.events_exchange.publish(message, routing_key=event_type)
+        latency = time.perf_counter() - started
+        self._latencies.append(latency)
+        BROKER_PUBLISH_DURATION.observe(latency, event_type)
+        logger.info(
+            "Published event %s",
+            event_type,
+            extra={
+                "sample": "broker.published",
+                "event_type": event_type,
+                "event_id": message_body["event_id"],
+                "latency_ms": round(latency * 1000, 3),
+            },
+        )
+        self.published += 1
 
-            print(f"Published event: {event_type} | ID: {message_body['event_id']}")
+    async def publish_many(
+        self, events: Iterable[Dict[str, Any]], ordered: bool = False
+    ) -> List[Optional[Exception]]:
+        """Publie un lot d'événements en pipeline
 
-        except Exception as e:
-            print(f"Failed to publish event {event_type}: {str(e)}")
-            raise
+        Chaque événement est un dict event_type/data (event_id et timestamp
+        optionnels). Renvoie, dans l'ordre, None ou l'exception de chaque
+        publication : un échec n'interrompt pas le reste du lot.
+
+        RabbitMQ ne garde l'ordre qu'au sein d'un canal : avec ordered=True,
+        tout le lot passe par le même canal du pool.
+        """
+        channel = None
+        if ordered:
+            channel = self._next_exchange
+            self._next_exchange += 1
+        results = await asyncio.gather(
+            *(
+                self.publish_event(
+                    event["event_type"],
+                    event["data"],
+                    event_id=event.get("event_id"),
+                    timestamp=event.get("timestamp"),
+                    channel=channel,
+                )
+                for event in events
+            ),
+            return_exceptions=True,
+        )
+        return [r if isinstance(r, Exception) else None for r in results]
+
+    def publish_stats(self) -> dict:
+        """Compteurs et percentiles de latence (ms) des publications récentes"""
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float):
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, int(p * len(latencies)))
+            return round(latencies[index] * 1000, 3)
 
-    async def subscribe_to_events(self, event_patterns: List[str], callback: Callable):
-        """S'abonne aux événements spécifiés"""
+        return {
+            "channels": len(self._publish_exchanges),
+            "published": self.published,
+            "errors": self.publish_errors,
+            "latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": percentile(1.0),
+            },
+        }
+
+    async def subscribe_to_events(
+        self,
+        event_patterns: List[str],
+        callback: Callable,
+        broadcast: bool = False,
+        prefetch_count: Optional[int] = None,
+    ):
+        """S'abonne aux événements spécifiés et renvoie la file
+
+        Par défaut la file durable est partagée entre les réplicas (chaque
+        événement est traité une seule fois). Avec broadcast=True, chaque
+        réplica reçoit tous les événements sur sa propre file exclusive.
+        Un prefetch_count dédié ouvre un canal propre à cet abonnement.
+        """
         if not self.channel:
             raise RuntimeError("Message broker not connected")
 
         try:
-            queue_name = f"{self.service_name}.events"
-            queue = await self.channel.declare_queue(
-                queue_name, durable=True, exclusive=False
-            )
+            channel = self.channel
+            if prefetch_count is not None:
+                channel = await self.connection.channel()
+                await channel.set_qos(prefetch_count=prefetch_count)
+
+            if broadcast:
+                queue = await channel.declare_queue(exclusive=True, auto_delete=True)
+            else:
+                queue_name = f"{self.service_name}.events"
+                queue = await channel.declare_queue(
+                    queue_name, durable=True, exclusive=False
+                )
 
             for pattern in event_patterns:
                 await queue.bind(self.events_exchange, routing_key=pattern)
-                print(f"Subscribed to pattern: {pattern}")
+                logger.info("Subscribed to pattern: %s", pattern)
 
             await queue.consume(callback)
+            return queue
 
         except Exception as e:
-            print(f"Failed to subscribe to events: {str(e)}")
+            logger.error("Failed to subscribe to events: %s", e)
             raise
 
+    def start(
+        self,
+        on_connected: Callable[[], Awaitable[None]],
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 30.0,
+        check_interval: float = 5.0,
+    ):
+        """Connexion en tâche de fond, sans bloquer le démarrage
+
+        Réessaie sans limite (délai doublé jusqu'à max_retry_delay), appelle
+        on_connected() pour les abonnements à chaque nouvelle connexion, puis
+        surveille la connexion. Les coupures réseau sont reprises par
+        connect_robust ; une connexion fermée pour de bon est refaite ici.
+        """
+        self._supervisor = asyncio.create_task(
+            self._supervise(on_connected, retry_delay, max_retry_delay, check_interval)
+        )
+
+    async def _supervise(self, on_connected, retry_delay, max_retry_delay, interval):
+        delay = retry_delay
+        while True:
+            # Fermée pour de bon : une reconnexion en cours reste à connect_robust
+            if self.connection is None or self.connection.is_closed:
+                try:
+                    await self.connect(max_retries=1)
+                    await on_connected()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.connect_failures += 1
+                    logger.warning(
+                        "Message broker unavailable, retrying in %.1f seconds: %s",
+                        delay,
+                        e,
+                    )
+                    # Abonnements incomplets : on repart d'une connexion neuve
+                    await self.close()
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, max_retry_delay)
+                    continue
+                self.connections += 1
+                delay = retry_delay
+            await asyncio.sleep(interval)
+
     async def close(self):
         """Ferme la connexion proprement"""
+        if (
+            self._supervisor is not None
+            and self._supervisor is not asyncio.current_task()
+        ):
+            self._supervisor.cancel()
+            try:
+                await self._supervisor
+            except asyncio.CancelledError:
+                pass
+            self._supervisor = None
         if self.connection and not self.connection.is_closed:
             await self.connection.close()
-            print(f"🔌 Message broker connection closed for {self.service_name}")
+            logger.info("Message broker connection closed for %s", self.service_name)
 
     @property
     def is_connected(self) -> bool:
-        """Vérifie si la connexion est active"""
-        return self.connection is not None and not self.connection.is_closed
+        """Vérifie si la connexion est active
+
+        Une connexion robuste en cours de reconnexion n'est pas fermée
+        (is_closed reste faux) : seul l'événement connected le signale.
+        """
+        return (
+            self.connection is not None
+            and not self.connection.is_closed
+            and self.connection.connected.is_set()
+        )
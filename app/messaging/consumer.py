@@ -0,0 +1,329 @@
+# app/messaging/consumer.py
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aio_pika
+
+from app.log import correlation
+from app.metrics import CONSUMER_BATCH_DURATION, CONSUMER_EVENTS, CONSUMER_LAG
+
+logger = logging.getLogger(__name__)
+
+BatchHandler = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class _AckTracker:
+    """Acquittements groupés pour un canal
+
+    Les workers terminent les lots dans le désordre : on n'envoie un
+    ack(multiple=True) que jusqu'au plus haut delivery_tag dont tous les
+    prédécesseurs sont réglés, sans jamais couvrir un message en cours.
+    """
+
+    def __init__(self):
+        self.outstanding: Dict[int, aio_pika.IncomingMessage] = {}
+        self.settled: Dict[int, bool] = {}
+
+    def add(self, message: aio_pika.IncomingMessage):
+        self.outstanding[message.delivery_tag] = message
+
+    def settle(self, message: aio_pika.IncomingMessage, needs_ack: bool):
+        self.settled[message.delivery_tag] = needs_ack
+
+    async def flush(self) -> int:
+        to_ack = None
+        released = 0
+        # Les tags sont insérés par ordre croissant de livraison
+        for tag in list(self.outstanding):
+            if tag not in self.settled:
+                break
+            message = self.outstanding.pop(tag)
+            if self.settled.pop(tag):
+                to_ack = message
+            released += 1
+
+        if to_ack is not None:
+            await to_ack.ack(multiple=True)
+        return released
+
+
+class EventConsumer:
+    """Consommateur d'événements concurrent avec micro-lots par type
+
+    Les messages sont regroupés par event_type pendant batch_window secondes
+    ou jusqu'à batch_size messages, puis traités par un pool de workers :
+    un appel de handler (donc une transaction) et un ack groupé par lot.
+
+    Les types enregistrés sur une même voie (lane) partagent un tampon et
+    leurs lots sont traités un à un, dans l'ordre d'arrivée : une annulation
+    ne peut pas être validée avant la création qui la précède.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        batch_size: int = 50,
+        batch_window: float = 0.05,
+        deduplicator=None,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.deduplicator = deduplicator
+        self.handlers: Dict[str, BatchHandler] = {}
+        self.lanes: Dict[str, str] = {}
+        self.queue = None
+
+        self._buffers: Dict[str, list] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._trackers: Dict[Any, _AckTracker] = {}
+        self._lane_locks: Dict[str, asyncio.Lock] = {}
+        self._work: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._lags = deque(maxlen=1000)
+
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.ignored = 0
+        self.duplicates = 0
+        self.batches = 0
+        self.in_flight = 0
+
+    def register(
+        self, event_type: str, handler: BatchHandler, lane: Optional[str] = None
+    ):
+        """Associe un handler de lot à un type d'événement (et à une voie ordonnée)"""
+        self.handlers[event_type] = handler
+        if lane is not None:
+            self.lanes[event_type] = lane
+
+    def start(self):
+        self._work = asyncio.Queue()
+        self._lane_locks = {lane: asyncio.Lock() for lane in set(self.lanes.values())}
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for key in list(self._buffers):
+            self._dispatch(key)
+        if self._work is not None:
+            await self._work.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def subscribe(
+        self,
+        broker,
+        event_patterns: Optional[List[str]] = None,
+        prefetch_count: int = 200,
+    ):
+        """Abonne le consommateur (par défaut aux types enregistrés)
+
+        Les types reçus sans handler sont acquittés et comptés comme ignorés.
+        """
+        self.queue = await broker.subscribe_to_events(
+            event_patterns=event_patterns or list(self.handlers),
+            callback=self.on_message,
+            prefetch_count=prefetch_count,
+        )
+
+    def _tracker(self, message) -> _AckTracker:
+        tracker = self._trackers.get(message.channel)
+        if tracker is None:
+            tracker = self._trackers[message.channel] = _AckTracker()
+        return tracker
+
+    async def on_message(self, message: aio_pika.IncomingMessage):
+        self.received += 1
+        self.in_flight += 1
+        tracker = self._tracker(message)
+        tracker.add(message)
+
+        try:
+            event = json.loads(message.body.decode())
+        except ValueError:
+            logger.warning(
+                "Invalid JSON in message", extra={"message_id": message.message_id}
+            )
+            await self._settle(message, needs_ack=True)
+            return
+
+        self._record_lag(event)
+        event_id = event.get("event_id") or message.message_id
+        event["event_id"] = event_id
+        logger.info(
+            "Received event %s",
+            event.get("event_type"),
+            extra={
+                "sample": "consumer.received",
+                "event_type": event.get("event_type"),
+                "correlation_id": event_id,
+            },
+        )
+        if self.deduplicator and self.deduplicator.seen(event_id):
+            self.duplicates += 1
+            CONSUMER_EVENTS.inc(event.get("event_type") or "unknown", "duplicate")
+            await self._settle(message, needs_ack=True)
+            return
+
+        # Tampon par voie ordonnée, sinon par type
+        event_type = event.get("event_type")
+        key = self.lanes.get(event_type, event_type)
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append((message, event))
+        if len(buffer) >= self.batch_size:
+            self._dispatch(key)
+        elif len(buffer) == 1:
+            self._timers[key] = asyncio.get_running_loop().call_later(
+                self.batch_window, self._dispatch, key
+            )
+
+    def _dispatch(self, key: str):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._buffers.pop(key, None)
+        if batch:
+            self._work.put_nowait((key, batch))
+
+    async def _worker(self):
+        while True:
+            key, batch = await self._work.get()
+            try:
+                lock = self._lane_locks.get(key)
+                if lock is None:
+                    await self._process(key, batch)
+                else:
+                    # Verrou équitable (FIFO) : les lots de la voie gardent
+                    # l'ordre dans lequel les workers les ont retirés
+                    async with lock:
+                        await self._process_lane(batch)
+            except Exception as e:
+                logger.exception(
+                    "Error processing %s batch: %s",
+                    key,
+                    e,
+                    extra={"event_type": key},
+                )
+            finally:
+                self._work.task_done()
+
+    async def _process_lane(self, batch: list):
+        """Lot d'une voie : une transaction par suite d'événements du même type"""
+        for event_type, run in groupby(
+            batch, key=lambda item: item[1].get("event_type")
+        ):
+            await self._process(event_type, list(run))
+
+    async def _process(self, event_type: str, batch: list):
+        handler = self.handlers.get(event_type)
+        if handler is None:
+            self.ignored += len(batch)
+            CONSUMER_EVENTS.inc(event_type, "ignored", amount=len(batch))
+            await self._settle_all(batch, needs_ack=True)
+            return
+
+        self.batches += 1
+        started = time.perf_counter()
+        try:
+            await handler([event for _, event in batch])
+            CONSUMER_BATCH_DURATION.observe(time.perf_counter() - started, event_type)
+            self.processed += len(batch)
+            CONSUMER_EVENTS.inc(event_type, "processed", amount=len(batch))
+            await self._settle_all(batch, needs_ack=True)
+            return
+        except Exception as e:
+            logger.warning(
+                "Error processing %s batch of %d: %s",
+                event_type,
+                len(batch),
+                e,
+                extra={
+                    "event_type": event_type,
+                    "event_ids": [event.get("event_id") for _, event in batch[:20]],
+                },
+            )
+
+        # Lot en échec : on isole les messages fautifs en les rejouant un par un
+        for message, event in batch:
+            try:
+                with correlation(event.get("event_id")):
+                    await handler([event])
+                self.processed += 1
+                CONSUMER_EVENTS.inc(event_type, "processed")
+                await self._settle(message, needs_ack=True)
+            except Exception as e:
+                self.failed += 1
+                CONSUMER_EVENTS.inc(event_type, "failed")
+                logger.error(
+                    "Error processing event %s: %s",
+                    event.get("event_id"),
+                    e,
+                    extra={
+                        "event_type": event_type,
+                        "correlation_id": event.get("event_id"),
+                    },
+                )
+                await message.reject(requeue=False)
+                await self._settle(message, needs_ack=False)
+
+    async def _settle(self, message, needs_ack: bool):
+        tracker = self._tracker(message)
+        tracker.settle(message, needs_ack)
+        self.in_flight -= await tracker.flush()
+
+    async def _settle_all(self, batch: list, needs_ack: bool):
+        trackers = set()
+        for message, _ in batch:
+            tracker = self._tracker(message)
+            tracker.settle(message, needs_ack)
+            trackers.add(tracker)
+        for tracker in trackers:
+            self.in_flight -= await tracker.flush()
+
+    def _record_lag(self, event: Dict[str, Any]):
+        try:
+            published = datetime.fromisoformat(event["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            return
+        if published.tzinfo is None:
+            published = published.replace(tzinfo=timezone.utc)
+        lag = (datetime.now(timezone.utc) - published).total_seconds()
+        self._lags.append(lag)
+        CONSUMER_LAG.observe(max(lag, 0.0), event.get("event_type") or "unknown")
+
+    async def queue_depth(self) -> Optional[int]:
+        """Messages en attente côté RabbitMQ (déclaration passive de la file)"""
+        if self.queue is None:
+            return None
+        result = await self.queue.declare()
+        return result.message_count
+
+    def stats(self) -> dict:
+        lags = sorted(self._lags)
+        return {
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "batch_window": self.batch_window,
+            "received": self.received,
+            "processed": self.processed,
+            "failed": self.failed,
+            "ignored": self.ignored,
+            "duplicates": self.duplicates,
+            "batches": self.batches,
+            "in_flight": self.in_flight,
+            "buffered": sum(len(b) for b in self._buffers.values()),
+            "lag_seconds": {
+                "last": round(self._lags[-1], 3) if lags else None,
+                "p50": round(lags[len(lags) // 2], 3) if lags else None,
+                "max": round(lags[-1], 3) if lags else None,
+            },
+        }
@@ -0,0 +1,129 @@
+# app/messaging/dedupe.py
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+
+from app.cache import TTLCache
+from app.models import ProcessedEventModel
+
+logger = logging.getLogger(__name__)
+
+
+class EventDeduplicator:
+    """Déduplication des événements consommés par event_id
+
+    Un LRU en mémoire écarte en O(1) les doublons récents ; la table
+    processed_events, écrite dans la transaction du traitement, couvre les
+    redémarrages et les autres réplicas.
+    """
+
+    def __init__(
+        self, maxsize: int = 100_000, retention: timedelta = timedelta(days=7)
+    ):
+        self.retention = retention
+        self.recent = TTLCache(maxsize=maxsize, ttl=retention.total_seconds())
+        self.duplicates = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def seen(self, event_id: Optional[str]) -> bool:
+        """Vrai si l'événement a déjà été traité par ce processus"""
+        if event_id and self.recent.get(event_id):
+            self.duplicates += 1
+            return True
+        return False
+
+    def remember(self, event_id: Optional[str]):
+        """À appeler après le commit du traitement"""
+        if event_id:
+            self.recent.set(event_id, True)
+
+    async def claim(self, db, event_id: Optional[str], event_type: str) -> bool:
+        """Enregistre l'événement dans la transaction courante
+
+        Renvoie False si un autre traitement l'a déjà enregistré : la
+        transaction n'a alors rien d'autre à faire.
+        """
+        event = {"event_id": event_id, "event_type": event_type}
+        return bool(await self.claim_many(db, [event]))
+
+    async def claim_many(self, db, events: List[dict]) -> List[dict]:
+        """Enregistre un lot d'événements en une instruction
+
+        Renvoie les événements à traiter, dans l'ordre : ceux sans event_id
+        et ceux enregistrés pour la première fois.
+        """
+        claimable = {}
+        for event in events:
+            if event.get("event_id"):
+                claimable.setdefault(event["event_id"], event["event_type"])
+        if not claimable:
+            return list(events)
+
+        claimed = set(
+            (
+                await db.scalars(
+                    insert(ProcessedEventModel)
+                    .values(
+                        [
+                            {"event_id": event_id, "event_type": event_type}
+                            for event_id, event_type in claimable.items()
+                        ]
+                    )
+                    .on_conflict_do_nothing(index_elements=["event_id"])
+                    .returning(ProcessedEventModel.event_id)
+                )
+            ).all()
+        )
+
+        to_process = []
+        for event in events:
+            event_id = event.get("event_id")
+            if not event_id:
+                to_process.append(event)
+            elif event_id in claimed:
+                # Un même event_id en double dans le lot n'est traité qu'une fois
+                claimed.discard(event_id)
+                to_process.append(event)
+            else:
+                self.duplicates += 1
+                self.remember(event_id)
+        return to_process
+
+    async def prune(self, session_factory) -> int:
+        """Supprime les identifiants plus anciens que la rétention"""
+        cutoff = datetime.now(timezone.utc) - self.retention
+        async with session_factory() as db:
+            async with db.begin():
+                result = await db.execute(
+                    delete(ProcessedEventModel).where(
+                        ProcessedEventModel.processed_at < cutoff
+                    )
+                )
+        return result.rowcount
+
+    def start_pruning(self, session_factory, interval: float = 3600.0):
+        async def run():
+            while True:
+                try:
+                    await self.prune(session_factory)
+                except Exception as e:
+                    logger.error("Error pruning processed events: %s", e)
+                await asyncio.sleep(interval)
+
+        self._task = asyncio.create_task(run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"duplicates": self.duplicates, "recent": self.recent.stats()}
@@ -0,0 +1,193 @@
+# app/messaging/dispatcher.py
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import update
+
+from app.models import OutboxEventModel
+from app.messaging.outbox import event_message
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP = "drop"
+
+
+class EventDispatcher:
+    """File bornée entre les routes et le broker, vidée en tâche de fond
+
+    Les routes y déposent les événements de l'outbox juste après le commit,
+    sans attendre RabbitMQ. Des publishers les publient par lots puis
+    marquent les lignes envoyées. En cas de débordement (politique "drop")
+    ou d'échec, la ligne reste en attente dans l'outbox et le relais la
+    reprend : rien n'est perdu, seul le délai augmente.
+
+    Tant que le spool disque du relais a des événements à rejouer, les
+    événements sont aussi laissés au relais, qui les publie après eux.
+    """
+
+    def __init__(
+        self,
+        broker,
+        session_factory,
+        maxsize: int = 10_000,
+        publishers: int = 2,
+        batch_size: int = 100,
+        overflow: str = OVERFLOW_DROP,
+        block_timeout: float = 0.5,
+        spool=None,
+    ):
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.broker = broker
+        self.session_factory = session_factory
+        self.maxsize = maxsize
+        self.publishers = publishers
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.spool = spool
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._closed = False
+        self._delays = deque(maxlen=4096)
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.published = 0
+        self.failed = 0
+        self.deferred = 0
+        self.max_depth = 0
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._closed = False
+        self._tasks = [
+            asyncio.create_task(self._publisher()) for _ in range(self.publishers)
+        ]
+
+    async def stop(self, timeout: float = 5.0):
+        """Arrêt propre : plus d'entrées, vidage de la file dans le délai imparti"""
+        self._closed = True
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Dispatcher stopped with %d events left to the outbox relay",
+                    self._queue.qsize(),
+                )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def dispatch(self, events: List[OutboxEventModel]):
+        """Dépose des événements déjà commités dans la file
+
+        Politique "block" : block_timeout borne l'attente de tout l'appel,
+        pas de chaque événement. Délai écoulé, le reste est laissé au relais.
+        """
+        deadline = asyncio.get_running_loop().time() + self.block_timeout
+        for event in events:
+            if self._closed or self._queue is None:
+                self.dropped += 1
+                continue
+
+            item = (event, time.perf_counter())
+            try:
+                self._queue.put_nowait(item)
+            except asyncio.QueueFull:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if self.overflow != OVERFLOW_BLOCK or remaining <= 0:
+                    self.dropped += 1
+                    continue
+                try:
+                    await asyncio.wait_for(self._queue.put(item), remaining)
+                except asyncio.TimeoutError:
+                    self.dropped += 1
+                    continue
+
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    async def _publisher(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._publish(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(
+                    "Error dispatching events: %s", e, extra={"events": len(batch)}
+                )
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _publish(self, batch: list):
+        if not self.broker.is_connected:
+            # Le relais les publiera à la reconnexion
+            self.failed += len(batch)
+            return
+        if self.spool is not None and self.spool.backlog_bytes > 0:
+            # Publiés maintenant, ils doubleraient les événements du spool
+            self.deferred += len(batch)
+            return
+
+        errors = await self.broker.publish_many(
+            event_message(event) for event, _ in batch
+        )
+
+        now = time.perf_counter()
+        sent_ids = []
+        for (event, enqueued_at), error in zip(batch, errors):
+            if error is None:
+                sent_ids.append(event.id)
+                self._delays.append(now - enqueued_at)
+            else:
+                self.failed += 1
+        if not sent_ids:
+            return
+
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(
+                    update(OutboxEventModel)
+                    .where(OutboxEventModel.id.in_(sent_ids))
+                    .where(OutboxEventModel.published_at.is_(None))
+                    .values(published_at=datetime.now(timezone.utc))
+                )
+        self.published += len(sent_ids)
+
+    def stats(self) -> dict:
+        delays = sorted(self._delays)
+
+        def percentile(p: float):
+            if not delays:
+                return None
+            return round(delays[min(len(delays) - 1, int(p * len(delays)))] * 1000, 3)
+
+        return {
+            "overflow": self.overflow,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_depth": self.max_depth,
+            "capacity": self.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "published": self.published,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "enqueue_to_publish_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": percentile(1.0),
+            },
+        }
@@ -5,6 +5,10 @@
 PRODUCT_CREATED = "product.created"
 PRODUCT_UPDATED = "product.updated"
 PRODUCT_DELETED = "product.deleted"
+PRODUCT_STOCK_CHANGED = "product.stock_changed"
+PRODUCT_STOCK_RESERVED = "product.stock_reserved"
+PRODUCT_STOCK_RESERVATION_FAILED = "product.stock_reservation_failed"
+PRODUCT_STOCK_RELEASED = "product.stock_released"
 
 # Événements auxquels cette API peut s'abonner (provenant d'autres services)
 
@@ -25,6 +29,10 @@ EVENT_DESCRIPTIONS = {
     PRODUCT_CREATED: "Nouveau produit créé",
     PRODUCT_UPDATED: "Produit mis à jour",
     PRODUCT_DELETED: "Produit supprimé",
+    PRODUCT_STOCK_CHANGED: "Stock produit modifié",
+    PRODUCT_STOCK_RESERVED: "Stock réservé pour une commande",
+    PRODUCT_STOCK_RESERVATION_FAILED: "Réservation de stock impossible",
+    PRODUCT_STOCK_RELEASED: "Réservation de stock libérée",
     CUSTOMER_CREATED: "Nouveau client créé",
     CUSTOMER_UPDATED: "Client mis à jour",
     CUSTOMER_DELETED: "Client supprimé",
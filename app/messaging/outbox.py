@@ -0,0 +1,292 @@
+# app/messaging/outbox.py
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update, delete
+
+from app.models import OutboxEventModel
+from app.changes import track_changes
+from app.messaging.spool import SpoolFull
+
+logger = logging.getLogger(__name__)
+
+
+def add_outbox_event(db, event_type: str, data: Dict[str, Any]) -> OutboxEventModel:
+    """Ajoute un événement à l'outbox dans la transaction courante de la session"""
+    event = OutboxEventModel(event_type=event_type, payload=data)
+    db.add(event)
+    track_changes(db, event_type, data)
+    db.info.setdefault("outbox_events", []).append(event)
+    return event
+
+
+def committed_outbox_events(db) -> List[OutboxEventModel]:
+    """Événements ajoutés par la session, à appeler une fois le commit réussi"""
+    return db.info.pop("outbox_events", [])
+
+
+async def dispatch_outbox(app, db):
+    """Transmet les événements commités au dispatcher, ou réveille le relais"""
+    events = committed_outbox_events(db)
+    dispatcher = getattr(app.state, "event_dispatcher", None)
+    if dispatcher:
+        await dispatcher.dispatch(events)
+        return
+    relay = getattr(app.state, "outbox_relay", None)
+    if relay and events:
+        relay.notify()
+
+
+def event_message(event: OutboxEventModel) -> Dict[str, Any]:
+    """Événement de l'outbox au format attendu par broker.publish_many"""
+    return {
+        "event_type": event.event_type,
+        "data": event.payload,
+        "event_id": event.event_id,
+        "timestamp": event.created_at,
+    }
+
+
+class OutboxRelay:
+    """Tâche de fond qui vide l'outbox par lots vers le message broker
+
+    Livraison au moins une fois : une ligne n'est marquée publiée qu'après
+    confirmation de RabbitMQ. Les lignes sont verrouillées avec SKIP LOCKED,
+    plusieurs réplicas peuvent donc relayer en parallèle.
+
+    Avec un spool disque, les lignes en attente sont déversées dans le spool
+    tant que le broker est indisponible (marquées publiées une fois le fsync
+    fait), puis relues dans l'ordre à la reconnexion, au plus replay_rate
+    événements par seconde pour ne pas affamer le trafic courant. Tant que
+    le spool n'est pas vide, les nouvelles lignes y sont aussi déversées
+    (le dispatcher les laisse au relais) : elles ne doublent pas les
+    événements plus anciens encore à rejouer.
+    """
+
+    def __init__(
+        self,
+        broker,
+        session_factory,
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+        retention: timedelta = timedelta(days=1),
+        min_age: float = 0.0,
+        spool=None,
+        replay_rate: float = 500.0,
+    ):
+        self.broker = broker
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retention = retention
+        # Délai de grâce laissé au dispatcher avant que le relais ne reprenne une ligne
+        self.min_age = min_age
+        self.spool = spool
+        self.replay_rate = replay_rate
+        self.published = 0
+        self.failed = 0
+        self.spilled = 0
+        self.replayed = 0
+        self._replay_tokens = float(batch_size)
+        self._replay_refill = time.monotonic()
+        self.last_error: Optional[str] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+
+    def notify(self):
+        self._wakeup.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        while True:
+            try:
+                relayed = await self.relay_once()
+                await self.replay_spool()
+                await self.prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                relayed = 0
+                self.last_error = str(e)
+                logger.error("Error relaying outbox events: %s", e)
+
+            # Lot plein : il reste probablement des événements, on enchaîne
+            if relayed >= self.batch_size:
+                continue
+            timeout = self.poll_interval
+            if self._replay_pending():
+                # Juste le temps de regagner un lot de relecture
+                timeout = min(timeout, self.batch_size / self.replay_rate)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _pending(self, db, min_age: float) -> List[OutboxEventModel]:
+        return (
+            await db.scalars(
+                select(OutboxEventModel)
+                .where(OutboxEventModel.published_at.is_(None))
+                .where(
+                    OutboxEventModel.created_at
+                    <= datetime.now(timezone.utc) - timedelta(seconds=min_age)
+                )
+                .order_by(OutboxEventModel.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+
+    async def relay_once(self) -> int:
+        """Publie un lot d'événements en attente, renvoie le nombre publié
+
+        Broker indisponible, ou spool encore à rejouer : le lot est déversé
+        dans le spool s'il y en a un, pour garder l'ordre de publication.
+        """
+        if self.spool is not None and (
+            not self.broker.is_connected or self._spool_backlog()
+        ):
+            return await self.spill_once()
+        if not self.broker.is_connected:
+            return 0
+
+        async with self.session_factory() as db:
+            async with db.begin():
+                events = await self._pending(db, self.min_age)
+                if not events:
+                    return 0
+
+                # Publications en pipeline : les confirmations sont attendues ensemble
+                errors = await self.broker.publish_many(
+                    (event_message(e) for e in events), ordered=True
+                )
+
+                sent_ids = []
+                for event, error in zip(events, errors):
+                    if error is not None:
+                        self.failed += 1
+                        self.last_error = str(error)
+                    else:
+                        sent_ids.append(event.id)
+
+                if sent_ids:
+                    await db.execute(
+                        update(OutboxEventModel)
+                        .where(OutboxEventModel.id.in_(sent_ids))
+                        .values(published_at=datetime.now(timezone.utc))
+                    )
+                self.published += len(sent_ids)
+                return len(sent_ids)
+
+    async def spill_once(self) -> int:
+        """Déverse un lot d'événements en attente dans le spool disque
+
+        Sans délai de grâce : le dispatcher ne publie pas dans ces conditions,
+        les lignes récentes suivent donc tout de suite les plus anciennes.
+        """
+        async with self.session_factory() as db:
+            async with db.begin():
+                events = await self._pending(db, 0.0)
+                if not events:
+                    return 0
+                try:
+                    await asyncio.to_thread(
+                        self.spool.append, [event_message(e) for e in events]
+                    )
+                except SpoolFull as e:
+                    # Les lignes restent dans l'outbox
+                    self.last_error = str(e)
+                    return 0
+
+                # Un arrêt avant le commit ne fait que dupliquer le lot
+                await db.execute(
+                    update(OutboxEventModel)
+                    .where(OutboxEventModel.id.in_([e.id for e in events]))
+                    .values(published_at=datetime.now(timezone.utc))
+                )
+                self.spilled += len(events)
+                return len(events)
+
+    def _spool_backlog(self) -> bool:
+        return self.spool is not None and self.spool.backlog_bytes > 0
+
+    def _replay_pending(self) -> bool:
+        return self.broker.is_connected and self._spool_backlog()
+
+    def _replay_allowance(self) -> int:
+        """Seau à jetons : replay_rate événements par seconde, un lot au plus"""
+        now = time.monotonic()
+        self._replay_tokens = min(
+            float(self.batch_size),
+            self._replay_tokens + (now - self._replay_refill) * self.replay_rate,
+        )
+        self._replay_refill = now
+        return int(self._replay_tokens)
+
+    async def replay_spool(self) -> int:
+        """Republie dans l'ordre un lot du spool, dans la limite du débit"""
+        if not self._replay_pending():
+            return 0
+        limit = self._replay_allowance()
+        if limit <= 0:
+            return 0
+
+        records = await asyncio.to_thread(self.spool.read, limit)
+        if not records:
+            return 0
+        self._replay_tokens -= len(records)
+
+        errors = await self.broker.publish_many(
+            (event for event, _ in records), ordered=True
+        )
+        # Le curseur n'avance que sur le préfixe confirmé : l'ordre est conservé
+        sent = next((i for i, e in enumerate(errors) if e is not None), len(errors))
+        if sent < len(errors):
+            self.failed += 1
+            self.last_error = str(errors[sent])
+        if sent:
+            await asyncio.to_thread(self.spool.commit, records[sent - 1][1], sent)
+            self.replayed += sent
+        return sent
+
+    async def prune(self, interval: float = 60.0):
+        """Supprime périodiquement les événements publiés au-delà de la rétention"""
+        now = asyncio.get_running_loop().time()
+        if now - self._last_prune < interval:
+            return
+        self._last_prune = now
+
+        cutoff = datetime.now(timezone.utc) - self.retention
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(
+                    delete(OutboxEventModel).where(
+                        OutboxEventModel.published_at < cutoff
+                    )
+                )
+
+    def stats(self) -> dict:
+        return {
+            "published": self.published,
+            "failed": self.failed,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "last_error": self.last_error,
+            "spool": self.spool.stats() if self.spool is not None else None,
+        }
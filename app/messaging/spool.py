@@ -0,0 +1,214 @@
+# app/messaging/spool.py
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from app.messaging.broker import encode_event
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".spool"
+CURSOR_FILE = "cursor"
+
+Position = Tuple[int, int]
+
+
+class SpoolFull(Exception):
+    """Le spool a atteint sa taille maximale"""
+
+
+class EventSpool:
+    """Spool disque en ajout seul pour les événements en attente du broker
+
+    Les événements sont écrits en JSON, un par ligne, dans des segments
+    numérotés. Chaque appel à append() se termine par un seul fsync : le
+    coût de la synchronisation est partagé par tout le lot. Le curseur de
+    relecture (segment, offset) est persisté après chaque lot publié, les
+    segments entièrement relus sont supprimés.
+
+    Livraison au moins une fois : après un arrêt brutal, les événements
+    relus mais pas encore validés dans le curseur sont republiés (les
+    consommateurs dédoublonnent par event_id).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._file = None
+
+        self.appended = 0
+        self.replayed = 0
+        self.rejected = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:012d}{SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[: -len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _recover(self):
+        segments = self._segments()
+        self._cursor = self._load_cursor() or (segments[0] if segments else 1, 0)
+        # Segments déjà relus dont la suppression a été interrompue
+        for segment in segments:
+            if segment < self._cursor[0]:
+                os.remove(self._path(segment))
+        segments = [s for s in segments if s >= self._cursor[0]]
+        if not segments or segments[0] != self._cursor[0]:
+            self._cursor = (segments[0] if segments else self._cursor[0], 0)
+
+        self._active = segments[-1] if segments else self._cursor[0]
+        self._open_active()
+        self._truncate_torn_tail()
+        self._size = sum(os.path.getsize(self._path(s)) for s in segments)
+
+    def _load_cursor(self) -> Optional[Position]:
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE), "rb") as f:
+                segment, offset = orjson.loads(f.read())
+            return segment, offset
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_cursor(self, position: Position):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(list(position)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _open_active(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self._path(self._active), "ab")
+
+    def _truncate_torn_tail(self):
+        """Supprime une dernière ligne incomplète (écriture interrompue)"""
+        self._file.seek(0, os.SEEK_END)
+        end = self._file.tell()
+        if end == 0:
+            return
+        with open(self._path(self._active), "rb") as f:
+            position = end
+            while position > 0:
+                start = max(0, position - 65536)
+                f.seek(start)
+                chunk = f.read(position - start)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    valid = start + newline + 1
+                    break
+                position = start
+            else:
+                valid = 0
+        if valid < end:
+            self._file.truncate(valid)
+            self._file.seek(valid)
+            logger.warning(
+                "Spool: truncated %d bytes of incomplete record", end - valid
+            )
+
+    def append(self, events: List[Dict[str, Any]]):
+        """Écrit un lot d'événements et le synchronise sur disque (un fsync)
+
+        Lève SpoolFull si le lot ferait dépasser max_bytes : rien n'est écrit.
+        """
+        data = b"".join(encode_event(event) + b"\n" for event in events)
+        with self._lock:
+            if self._size + len(data) > self.max_bytes:
+                self.rejected += len(events)
+                raise SpoolFull(f"Spool full ({self._size} bytes)")
+
+            if self._file.tell() >= self.segment_bytes:
+                self._file.close()
+                self._active += 1
+                self._open_active()
+
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._size += len(data)
+            self.appended += len(events)
+
+    def read(self, limit: int) -> List[Tuple[Dict[str, Any], Position]]:
+        """Lit jusqu'à limit événements à partir du curseur, sans l'avancer
+
+        Chaque événement est accompagné de la position qui suit son
+        enregistrement, à passer à commit() une fois publié.
+        """
+        events = []
+        with self._lock:
+            segment, offset = self._cursor
+            while len(events) < limit and segment <= self._active:
+                with open(self._path(segment), "rb") as f:
+                    f.seek(offset)
+                    for line in f:
+                        if len(events) >= limit:
+                            break
+                        offset += len(line)
+                        event = orjson.loads(line)
+                        event["timestamp"] = datetime.fromisoformat(event["timestamp"])
+                        events.append((event, (segment, offset)))
+                if len(events) < limit and segment < self._active:
+                    segment, offset = segment + 1, 0
+                else:
+                    break
+        return events
+
+    def commit(self, position: Position, count: int):
+        """Avance le curseur après publication, supprime les segments relus"""
+        with self._lock:
+            self._save_cursor(position)
+            for segment in range(self._cursor[0], position[0]):
+                path = self._path(segment)
+                self._size -= os.path.getsize(path)
+                os.remove(path)
+            self._cursor = position
+            self.replayed += count
+
+    @property
+    def backlog_bytes(self) -> int:
+        with self._lock:
+            segment, offset = self._cursor
+            pending = -offset
+            for s in range(segment, self._active):
+                pending += os.path.getsize(self._path(s))
+            return pending + self._file.tell()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "segments": self._active - self._cursor[0] + 1,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "backlog_bytes": self.backlog_bytes,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,336 @@
+# app/metrics.py
+import logging
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Bornes (secondes) communes aux histogrammes de latence
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Retard de consommation : de la milliseconde à l'heure
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Compteur par combinaison de labels
+
+    Les mises à jour se font sans verrou : elles viennent de la boucle
+    d'événements (un seul thread), chaque worker uvicorn expose ses propres
+    valeurs et Prometheus agrège par instance.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for labels, value in list(self._values.items()):
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        # Un compteur par borne, plus le dernier pour +Inf (non cumulés)
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram:
+    """Histogramme à bornes fixes : une recherche dichotomique et deux additions"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, _HistogramSeries] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _HistogramSeries(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series.counts) if series else 0
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        names = self.labelnames + ("le",)
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    _format_labels(names, labels + (_format_value(bound),)),
+                    cumulative,
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum", label_text, series.sum
+            yield f"{self.name}_count", label_text, cumulative
+
+
+class Collected:
+    """Métrique lue au moment de l'export depuis les statistiques existantes
+
+    collect() renvoie des couples (valeurs de labels, valeur) ; les sources
+    (caches, pools, consommateur...) gardent leurs propres compteurs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Iterable[Tuple[Labels, float]]],
+        type: str = "gauge",
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.type = type
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for labels, value in self.collect():
+            if value is not None:
+                yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrique déjà enregistrée : {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str):
+        self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        """Format texte d'exposition Prometheus"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.error("Metrics: failed to collect %s: %s", metric.name, e)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = LATENCY_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def collected(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str],
+    collect: Callable[[], Iterable[Tuple[Labels, float]]],
+    type: str = "gauge",
+) -> Collected:
+    return REGISTRY.register(Collected(name, documentation, labelnames, collect, type))
+
+
+# HTTP
+HTTP_REQUESTS = counter(
+    "http_requests_total", "Requêtes HTTP traitées", ("method", "route", "status")
+)
+HTTP_DURATION = histogram(
+    "http_request_duration_seconds",
+    "Durée des requêtes HTTP, corps de réponse compris",
+    ("method", "route"),
+)
+
+# Base de données
+DB_STATEMENT_DURATION = histogram(
+    "db_statement_duration_seconds",
+    "Durée d'exécution des requêtes SQL",
+    ("engine", "operation"),
+)
+DB_ERRORS = counter("db_errors_total", "Requêtes SQL en erreur", ("engine",))
+DB_POOL_WAIT = histogram(
+    "db_pool_checkout_wait_seconds",
+    "Attente d'une connexion libre dans le pool",
+    ("pool",),
+)
+
+# Broker
+BROKER_PUBLISH_DURATION = histogram(
+    "broker_publish_duration_seconds",
+    "Publication d'un événement jusqu'à la confirmation de RabbitMQ",
+    ("event_type",),
+)
+BROKER_PUBLISH_ERRORS = counter(
+    "broker_publish_errors_total", "Publications en échec", ("event_type",)
+)
+CONSUMER_LAG = histogram(
+    "consumer_event_lag_seconds",
+    "Délai entre la publication d'un événement et sa réception",
+    ("event_type",),
+    buckets=LAG_BUCKETS,
+)
+CONSUMER_BATCH_DURATION = histogram(
+    "consumer_batch_duration_seconds",
+    "Traitement d'un lot d'événements consommés",
+    ("event_type",),
+)
+CONSUMER_EVENTS = counter(
+    "consumer_events_total",
+    "Événements consommés par résultat",
+    ("event_type", "outcome"),
+)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : latence et statut par route (modèle de chemin)
+
+    Le modèle (/products/{product_id}) évite une série par identifiant.
+    La durée court jusqu'au dernier octet envoyé, streaming compris.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            HTTP_DURATION.observe(time.perf_counter() - started, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status))
+
+
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def _engine_label(conn) -> str:
+    monitor = getattr(conn.engine.pool, "monitor", None)
+    return monitor.name if monitor is not None else "default"
+
+
+def _operation(statement: str) -> str:
+    words = statement[:16].split(None, 1)
+    operation = words[0].upper() if words else ""
+    return operation if operation in SQL_OPERATIONS else "OTHER"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    DB_STATEMENT_DURATION.observe(
+        time.perf_counter() - started, _engine_label(conn), _operation(statement)
+    )
+
+
+@event.listens_for(Engine, "handle_error")
+def _statement_failed(exception_context):
+    conn = exception_context.connection
+    if conn is None:
+        return
+    stack = conn.info.get("metrics_started")
+    # Erreur pendant l'exécution : le chronomètre empilé n'a pas été dépilé
+    if exception_context.cursor is not None and stack:
+        stack.pop()
+    DB_ERRORS.inc(_engine_label(conn))
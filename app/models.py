@@ -1,11 +1,35 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Numeric, Text, DateTime
+import uuid
+from sqlalchemy import (
+    Column,
+    BigInteger,
+    Integer,
+    String,
+    Numeric,
+    Text,
+    DateTime,
+    JSON,
+    Index,
+    UniqueConstraint,
+    Sequence,
+    func,
+    text,
+)
 from datetime import datetime, timezone
 from app.db import Base
 
 
 class ProductModel(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Égalité sur color puis id : parcours keyset dans l'ordre, sans tri
+        Index("ix_products_color_id", "color", "id"),
+        # Intervalle de prix : l'index restreint les lignes lues, mais elles
+        # sortent dans l'ordre (price, id). Tri de tout l'intervalle à chaque
+        # page : coût proportionnel au nombre de produits dans l'intervalle
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_in_stock_id", "id", postgresql_where=text("stock > 0")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -14,5 +38,109 @@ class ProductModel(Base):
     color = Column(String, nullable=True)
     stock = Column(Integer, nullable=True)
     created_at = Column(
-        DateTime, default=lambda: datetime.now(timezone.utc), nullable=False
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    # Incrémentée à chaque modification : ETag et concurrence optimiste
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+
+def version_bump() -> dict:
+    """Valeurs à ajouter à tout UPDATE de products : nouvelle version, horodatage"""
+    return {"version": ProductModel.version + 1, "updated_at": func.now()}
+
+
+class OutboxEventModel(Base):
+    """Événements à publier, écrits dans la même transaction que le produit"""
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index(
+            "ix_outbox_events_pending",
+            "id",
+            postgresql_where=text("published_at IS NULL"),
+        ),
+        Index("ix_outbox_events_published_at", "published_at"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    event_id = Column(
+        String(36), nullable=False, unique=True, default=lambda: str(uuid.uuid4())
+    )
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    published_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class StockReservationModel(Base):
+    """Quantités réservées par commande, pour pouvoir les libérer à l'annulation"""
+
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        UniqueConstraint(
+            "order_id", "product_id", name="uq_stock_reservations_order_product"
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    order_id = Column(String, nullable=False)
+    product_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String, nullable=False)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    released_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ProcessedEventModel(Base):
+    """Événements externes déjà traités, pour une consommation idempotente"""
+
+    __tablename__ = "processed_events"
+
+    event_id = Column(String(64), primary_key=True)
+    event_type = Column(String, nullable=False)
+    processed_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False, index=True
+    )
+
+
+product_changes_seq = Sequence("product_changes_seq", metadata=Base.metadata)
+
+
+class ProductChangeModel(Base):
+    """Journal des modifications compacté : une ligne par produit, la dernière
+
+    Chaque écriture réattribue au produit un numéro de séquence croissant ;
+    le flux de changements parcourt l'index sur seq à partir d'un curseur.
+    Les suppressions restent sous forme de pierres tombales (op = "delete").
+    """
+
+    __tablename__ = "product_changes"
+
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    seq = Column(
+        BigInteger,
+        product_changes_seq,
+        server_default=product_changes_seq.next_value(),
+        nullable=False,
+        unique=True,
+    )
+    op = Column(String(10), nullable=False)
+    changed_at = Column(
+        DateTime(timezone=True),
+        server_default=func.clock_timestamp(),
+        nullable=False,
     )
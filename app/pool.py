@@ -0,0 +1,112 @@
+# app/pool.py
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.metrics import DB_POOL_WAIT
+
+# Fenêtre glissante des attentes récentes, pour les percentiles
+WAIT_SAMPLES = 1000
+
+
+class PoolMonitor:
+    """Temps d'attente des emprunts de connexion et saturation d'un pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool: Optional[AsyncAdaptedQueuePool] = None
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        DB_POOL_WAIT.observe(wait, self.name)
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self._waits.append(wait)
+
+    def _percentile(self, waits: list, p: float) -> Optional[float]:
+        if not waits:
+            return None
+        return round(waits[min(len(waits) - 1, int(len(waits) * p))] * 1000, 3)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            attempts = self.checkouts + self.timeouts
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "avg": (
+                        round(self.total_wait / attempts * 1000, 3)
+                        if attempts
+                        else None
+                    ),
+                    "p50": self._percentile(waits, 0.50),
+                    "p95": self._percentile(waits, 0.95),
+                    "p99": self._percentile(waits, 0.99),
+                    "max": round(self.max_wait * 1000, 3),
+                },
+            }
+        pool = self.pool
+        if pool is not None:
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            stats.update(
+                {
+                    "size": pool.size(),
+                    "max_overflow": pool._max_overflow,
+                    "checked_out": pool.checkedout(),
+                    "idle": pool.checkedin(),
+                    "overflow": pool.overflow(),
+                    # Part des connexions possibles actuellement empruntées
+                    "saturation": (
+                        round(pool.checkedout() / capacity, 3) if capacity else None
+                    ),
+                }
+            )
+        return {"name": self.name, **stats}
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """Pool asyncio qui mesure l'attente de chaque emprunt de connexion"""
+
+    monitor: Optional[PoolMonitor] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.monitor is not None:
+                self.monitor.record(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.monitor is not None:
+            self.monitor.record(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() recrée le pool : le suivi continue sur le nouveau
+        pool = super().recreate()
+        watch(pool, self.monitor)
+        return pool
+
+
+def watch(pool, monitor: Optional[PoolMonitor]):
+    """Rattache un moniteur au pool (et aux pools qui le remplaceront)"""
+    if monitor is not None and isinstance(pool, MonitoredQueuePool):
+        pool.monitor = monitor
+        monitor.pool = pool
@@ -0,0 +1,269 @@
+# app/profiling.py
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.cache import TTLCache
+
+API_TOKEN = os.getenv("API_TOKEN")
+# Part des requêtes profilées sans en-tête (0 : uniquement sur demande)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+# Même requête SQL répétée au moins ce nombre de fois : N+1 probable
+N_PLUS_ONE_THRESHOLD = int(os.getenv("PROFILE_N_PLUS_ONE_THRESHOLD", "5"))
+MAX_STATEMENTS = 500
+MAX_STACK_DEPTH = 40
+TOP = 20
+
+PROFILE_HEADER = b"x-profile"
+IDLE = "(idle)"
+
+# Profil de la requête en cours ; None hors profilage
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar(
+    "request_profile", default=None
+)
+
+# Derniers profils, relus par GET /debug/profiles/{id}
+profile_store = TTLCache(
+    maxsize=int(os.getenv("PROFILE_STORE_SIZE", "100")),
+    ttl=float(os.getenv("PROFILE_STORE_TTL", "3600")),
+)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    # Chemins relatifs au projet, nom de module seul pour les dépendances
+    if filename.startswith(os.getcwd()):
+        filename = os.path.relpath(filename)
+    elif "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    return f"{filename}:{code.co_name}:{frame.f_lineno}"
+
+
+class StackSampler(threading.Thread):
+    """Échantillonne la pile du thread de la boucle d'événements
+
+    La boucle exécute aussi les autres requêtes en cours : le profil décrit
+    ce que faisait le processus pendant la requête, pas elle seule. Une
+    boucle en attente d'E/S (select) est comptée comme inactive.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True, name="request-profiler")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            if ":select:" in stack[-1]:
+                stack = [IDLE]
+            self.stacks[";".join(stack)] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class RequestProfile:
+    """Requêtes SQL et échantillons de pile d'une requête HTTP profilée"""
+
+    def __init__(self, method: str, path: str, reason: str):
+        self.id = secrets.token_hex(8)
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = datetime.now(timezone.utc)
+        self.status: Optional[int] = None
+        self.duration = 0.0
+        self.statements: List[tuple] = []
+        self.statement_count = 0
+        self.sql_time = 0.0
+        self.by_statement: Dict[str, List[float]] = {}
+        self._started = time.perf_counter()
+        self._sampler: Optional[StackSampler] = None
+
+    def start(self):
+        self._sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL)
+        self._sampler.start()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self._started
+        if self._sampler is not None:
+            self._sampler.stop()
+
+    def record_statement(self, statement: str, duration: float):
+        self.statement_count += 1
+        self.sql_time += duration
+        if len(self.statements) < MAX_STATEMENTS:
+            self.statements.append((statement, duration))
+        self.by_statement.setdefault(statement, []).append(duration)
+
+    def repeated_statements(self) -> List[dict]:
+        """Requêtes identiques (au paramètre près) exécutées en boucle"""
+        repeated = [
+            {
+                "statement": statement,
+                "count": len(durations),
+                "total_ms": round(sum(durations) * 1000, 3),
+            }
+            for statement, durations in self.by_statement.items()
+            if len(durations) >= N_PLUS_ONE_THRESHOLD
+        ]
+        return sorted(repeated, key=lambda r: r["count"], reverse=True)
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.sql_time * 1000:.3f};desc="{self.statement_count} queries", '
+            f"total;dur={(time.perf_counter() - self._started) * 1000:.3f}"
+        )
+
+    def summary(self) -> dict:
+        repeated = self.repeated_statements()
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "sql_count": self.statement_count,
+            "sql_ms": round(self.sql_time * 1000, 3),
+            "n_plus_one": bool(repeated),
+        }
+
+    def report(self) -> dict:
+        sampler = self._sampler
+        stacks = sampler.stacks if sampler is not None else Counter()
+        functions: Counter = Counter()
+        for stack, count in stacks.items():
+            functions[stack.rsplit(";", 1)[-1]] += count
+        return {
+            **self.summary(),
+            "sql": {
+                "statements": [
+                    {"statement": statement, "duration_ms": round(d * 1000, 3)}
+                    for statement, d in self.statements
+                ],
+                "truncated": self.statement_count > len(self.statements),
+                "repeated": self.repeated_statements(),
+            },
+            "samples": {
+                "interval_ms": PROFILE_INTERVAL * 1000,
+                "count": sampler.samples if sampler is not None else 0,
+                "idle": stacks.get(IDLE, 0),
+                "top_functions": [
+                    {"function": function, "samples": count}
+                    for function, count in functions.most_common(TOP)
+                ],
+                "top_stacks": [
+                    {"stack": stack, "samples": count}
+                    for stack, count in stacks.most_common(TOP)
+                ],
+            },
+        }
+
+
+def _profile_reason(scope) -> Optional[str]:
+    """Profilage demandé par en-tête authentifié, ou requête tirée au sort"""
+    requested = False
+    authorized = False
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            requested = value not in (b"", b"0")
+        elif name == b"authorization":
+            authorized = value.decode("latin-1") == f"Bearer {API_TOKEN}"
+    if requested and authorized and API_TOKEN:
+        return "header"
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI : profile les requêtes demandées, sinon simple passage
+
+    Le profil complet est conservé dans profile_store ; la réponse porte
+    son identifiant (X-Profile-Id) et un en-tête Server-Timing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        reason = _profile_reason(scope)
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], reason)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.id.encode()),
+                    (b"server-timing", profile.server_timing().encode()),
+                ]
+            await send(message)
+
+        token = _current.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            profile.stop()
+            _current.reset(token)
+            profile_store.set(profile.id, profile)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is None:
+        return
+    stack = conn.info.get("profile_started")
+    if stack:
+        profile.record_statement(statement, time.perf_counter() - stack.pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _statement_failed(exception_context):
+    conn = exception_context.connection
+    if _current.get() is None or conn is None or exception_context.cursor is None:
+        return
+    stack = conn.info.get("profile_started")
+    if stack:
+        stack.pop()
@@ -1,16 +1,100 @@
 import os
-from typing import List
-from datetime import datetime, timezone
-from fastapi import HTTPException, Depends, Security, APIRouter, Request
+import io
+import csv
+import json
+import logging
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from fastapi import (
+    HTTPException,
+    Depends,
+    Security,
+    APIRouter,
+    Request,
+    Query,
+    Body,
+    Header,
+)
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from sqlalchemy import (
+    select,
+    insert,
+    update,
+    delete,
+    case,
+    literal,
+    func,
+    any_,
+    bindparam,
+    Integer,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
-from app.schemas import Product, ProductUpdate
-from app.models import ProductModel
-from app.messaging.events import PRODUCT_CREATED, PRODUCT_UPDATED, PRODUCT_DELETED
+from app.db import (
+    get_db,
+    get_read_db,
+    get_session_factory,
+    get_read_session_factory,
+    read_engine,
+    replica_enabled,
+    reads_replica,
+    reads_from_primary,
+    pool_stats,
+    READ_YOUR_WRITES_SECONDS,
+)
+from app.cache import (
+    product_cache,
+    page_cache,
+    on_invalidate,
+    invalidate_product,
+    invalidated_within,
+    generation,
+    cache_stats,
+)
+from app.loader import BatchLoader
+from app.catalog import catalog_snapshot
+from app.profiling import profile_store
+from app.serialization import PRODUCT_COLUMNS, product_columns, product_row, dumps
+from app.schemas import (
+    Product,
+    ProductUpdate,
+    ProductFilters,
+    ProductPage,
+    ProductChange,
+    ChangePage,
+    ProductBatchUpdate,
+    ProductIds,
+    StockDelta,
+    StockLevel,
+    BatchItemResult,
+    BatchResult,
+)
+from app.models import ProductModel, ProductChangeModel, version_bump
+from app.messaging.events import (
+    PRODUCT_CREATED,
+    PRODUCT_UPDATED,
+    PRODUCT_DELETED,
+    PRODUCT_STOCK_CHANGED,
+)
+from app.messaging.outbox import add_outbox_event, dispatch_outbox
+
+logger = logging.getLogger(__name__)
 
 API_TOKEN = os.getenv("API_TOKEN")
+DEFAULT_PAGE_SIZE = int(os.getenv("PRODUCTS_DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("PRODUCTS_MAX_PAGE_SIZE", "200"))
+MAX_BATCH_SIZE = int(os.getenv("PRODUCTS_MAX_BATCH_SIZE", "1000"))
+MAX_BATCH_IDS = int(os.getenv("PRODUCTS_MAX_BATCH_IDS", "500"))
+EXPORT_BATCH_SIZE = int(os.getenv("PRODUCTS_EXPORT_BATCH_SIZE", "1000"))
+# Délai avant qu'un changement n'apparaisse dans le flux : laisse aux
+# transactions concurrentes le temps de valider leurs numéros de séquence
+CHANGE_FEED_SETTLE = timedelta(
+    seconds=float(os.getenv("CHANGE_FEED_SETTLE_SECONDS", "1.0"))
+)
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
 security = HTTPBearer()
 router = APIRouter()
 
@@ -20,77 +104,710 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
         raise HTTPException(status_code=403, detail="Accès interdit")
 
 
-async def publish_event_safe(request: Request, event_type: str, data: dict):
-    """Publier un événement de manière sécurisée"""
-    try:
-        broker = getattr(request.app.state, "broker", None)
-        if broker and broker.is_connected:
-            await broker.publish_event(event_type, data)
-            print(f"Event published: {event_type}")
-        else:
-            print(
-                f"Warning: Message broker not available, event {event_type} not published"
-            )
-    except Exception as e:
-        print(f"Error publishing event {event_type}: {str(e)}")
+def product_filters(
+    color: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: bool = False,
+) -> ProductFilters:
+    return ProductFilters(
+        color=color, min_price=min_price, max_price=max_price, in_stock=in_stock
+    )
+
+
+def apply_product_filters(stmt, filters: ProductFilters):
+    """Applique les filtres serveur sur une requête select() de produits"""
+    if filters.color is not None:
+        stmt = stmt.where(ProductModel.color == filters.color)
+    if filters.min_price is not None:
+        stmt = stmt.where(ProductModel.price >= filters.min_price)
+    if filters.max_price is not None:
+        stmt = stmt.where(ProductModel.price <= filters.max_price)
+    if filters.in_stock:
+        stmt = stmt.where(ProductModel.stock > 0)
+    return stmt
+
+
+def product_payload(product) -> dict:
+    """Données produit communes aux événements product.*"""
+    return {
+        "product_id": product.id,
+        "name": product.name,
+        "price": float(product.price),
+        "description": product.description,
+        "color": product.color,
+        "stock": product.stock,
+        "version": product.version,
+    }
+
+
+# Champs du schéma Product gérés par le serveur, ignorés à la création
+SERVER_FIELDS = {"id", "created_at", "version", "updated_at"}
+
+# Colonnes reprises dans old_values des événements product.updated
+AUDITED_FIELDS = ("name", "price", "description", "color", "stock")
+
+
+def update_returning_old(where, values: dict):
+    """UPDATE ... FROM (SELECT ... FOR UPDATE) old ... RETURNING
+
+    Le sous-select verrouille les lignes et expose leurs valeurs avant
+    modification : produit modifié et anciennes valeurs en une instruction.
+    """
+    old = (
+        select(ProductModel.id, *[getattr(ProductModel, f) for f in AUDITED_FIELDS])
+        .where(where)
+        .with_for_update()
+        .subquery("old")
+    )
+    return (
+        update(ProductModel)
+        .where(ProductModel.id == old.c.id)
+        # Sans modification, l'UPDATE neutre verrouille et renvoie quand même la ligne
+        .values({**values, **version_bump()} if values else {"id": ProductModel.id})
+        .returning(ProductModel, *[old.c[f].label(f"old_{f}") for f in AUDITED_FIELDS])
+        .execution_options(synchronize_session=False)
+    )
+
+
+def row_old_values(row) -> dict:
+    values = {f: getattr(row, f"old_{f}") for f in AUDITED_FIELDS}
+    values["price"] = float(values["price"])
+    return values
 
 
 @router.post("/products", response_model=Product)
 async def create_product(
     product: Product,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     _: HTTPAuthorizationCredentials = Security(verify_token),
 ):
     try:
-        db_product = ProductModel(
-            **product.model_dump(exclude={"id", "created_at", "updated_at"})
+        # INSERT ... RETURNING : id et valeurs par défaut sans flush ni refresh
+        db_product = await db.scalar(
+            insert(ProductModel)
+            .values(**product.model_dump(exclude=SERVER_FIELDS))
+            .returning(ProductModel)
         )
-        db.add(db_product)
-        db.commit()
-        db.refresh(db_product)
 
-        await publish_event_safe(
-            request,
+        add_outbox_event(
+            db,
             PRODUCT_CREATED,
             {
-                "product_id": db_product.id,
-                "name": db_product.name,
-                "price": float(db_product.price),
-                "description": db_product.description,
-                "color": db_product.color,
-                "stock": db_product.stock,
+                **product_payload(db_product),
                 "created_at": datetime.now(timezone.utc).isoformat(),
             },
         )
+        await db.commit()
+        invalidate_product(db_product.id)
+        await dispatch_outbox(request.app, db)
 
         return db_product
 
-    except Exception as e:
-        db.rollback()
-        print(f"Error creating product: {str(e)}")
+    except Exception:
+        await db.rollback()
+        logger.exception("Error creating product")
         raise HTTPException(
             status_code=500, detail="Erreur lors de la création du produit"
         )
 
 
-@router.get("/products", response_model=List[Product])
-def list_products(
-    db: Session = Depends(get_db),
+def validate_batch(items: List[Dict[str, Any]], schema):
+    """Valide chaque élément séparément pour rapporter les erreurs par index"""
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop volumineux (maximum {MAX_BATCH_SIZE} éléments)",
+        )
+
+    valid, results = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as e:
+            results.append(
+                BatchItemResult(
+                    index=index, status=422, error=json.loads(e.json(include_url=False))
+                )
+            )
+    return valid, results
+
+
+def batch_result(results: List[BatchItemResult]) -> BatchResult:
+    results.sort(key=lambda r: r.index)
+    failed = sum(1 for r in results if r.status >= 400)
+    return BatchResult(succeeded=len(results) - failed, failed=failed, results=results)
+
+
+@router.post("/products:batch", response_model=BatchResult)
+async def create_products_batch(
+    request: Request,
+    items: List[Dict[str, Any]] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    _: HTTPAuthorizationCredentials = Security(verify_token),
+):
+    """Création en lot : un INSERT multi-lignes ... RETURNING, une transaction"""
+    valid, results = validate_batch(items, Product)
+    if not valid:
+        return batch_result(results)
+
+    try:
+        products = (
+            await db.scalars(
+                insert(ProductModel).returning(
+                    ProductModel, sort_by_parameter_order=True
+                ),
+                [p.model_dump(exclude=SERVER_FIELDS) for _, p in valid],
+            )
+        ).all()
+
+        created_at = datetime.now(timezone.utc).isoformat()
+        for product in products:
+            add_outbox_event(
+                db,
+                PRODUCT_CREATED,
+                {**product_payload(product), "created_at": created_at},
+            )
+        await db.commit()
+
+    except Exception:
+        await db.rollback()
+        logger.exception("Error creating products batch")
+        raise HTTPException(
+            status_code=500, detail="Erreur lors de la création des produits"
+        )
+
+    for product in products:
+        invalidate_product(product.id)
+    await dispatch_outbox(request.app, db)
+
+    for (index, _), product in zip(valid, products):
+        results.append(
+            BatchItemResult(
+                index=index,
+                status=201,
+                id=product.id,
+                product=Product.model_validate(product),
+            )
+        )
+    return batch_result(results)
+
+
+@router.patch("/products:batch", response_model=BatchResult)
+async def update_products_batch(
+    request: Request,
+    items: List[Dict[str, Any]] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    _: HTTPAuthorizationCredentials = Security(verify_token),
+):
+    """Mise à jour en lot : un seul UPDATE ... CASE ... RETURNING
+
+    Les anciennes valeurs viennent du sous-select verrouillé de l'UPDATE.
+    """
+    valid, results = validate_batch(items, ProductBatchUpdate)
+
+    updates = {}
+    for index, item in valid:
+        if item.id in updates:
+            results.append(
+                BatchItemResult(
+                    index=index,
+                    status=409,
+                    id=item.id,
+                    error="Identifiant en double dans le lot",
+                )
+            )
+        else:
+            updates[item.id] = (
+                index,
+                item.model_dump(exclude_unset=True, exclude={"id"}),
+            )
+    if not updates:
+        return batch_result(results)
+
+    try:
+        table = ProductModel.__table__
+
+        # Une expression CASE par colonne modifiée, indexée sur l'id
+        fields = {f for changes in updates.values() for f in changes[1]}
+        assignments = {
+            field: case(
+                {
+                    pid: literal(changes[field], table.c[field].type)
+                    for pid, (_, changes) in updates.items()
+                    if field in changes
+                },
+                value=table.c.id,
+                else_=table.c[field],
+            )
+            for field in fields
+        }
+
+        rows = (
+            await db.execute(
+                update_returning_old(ProductModel.id.in_(updates), assignments)
+            )
+        ).all()
+        products = {}
+        for row in rows:
+            product = products[row[0].id] = row[0]
+            add_outbox_event(
+                db,
+                PRODUCT_UPDATED,
+                {
+                    **product_payload(product),
+                    "changes": updates[product.id][1],
+                    "old_values": row_old_values(row),
+                },
+            )
+        await db.commit()
+
+    except Exception:
+        await db.rollback()
+        logger.exception("Error updating products batch")
+        raise HTTPException(
+            status_code=500, detail="Erreur lors de la mise à jour des produits"
+        )
+
+    for pid in products:
+        invalidate_product(pid)
+    await dispatch_outbox(request.app, db)
+
+    for pid, (index, _) in updates.items():
+        if pid in products:
+            results.append(
+                BatchItemResult(
+                    index=index,
+                    status=200,
+                    id=pid,
+                    product=Product.model_validate(products[pid]),
+                )
+            )
+        else:
+            results.append(
+                BatchItemResult(
+                    index=index, status=404, id=pid, error="Produit non trouvé"
+                )
+            )
+    return batch_result(results)
+
+
+@router.delete("/products:batch", response_model=BatchResult)
+async def delete_products_batch(
+    payload: ProductIds,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    _: HTTPAuthorizationCredentials = Security(verify_token),
+):
+    """Suppression en lot : un seul DELETE ... RETURNING"""
+    if len(payload.ids) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lot trop volumineux (maximum {MAX_BATCH_SIZE} éléments)",
+        )
+
+    try:
+        deleted = (
+            await db.scalars(
+                delete(ProductModel)
+                .where(ProductModel.id.in_(set(payload.ids)))
+                .returning(ProductModel)
+                .execution_options(synchronize_session=False)
+            )
+        ).all()
+
+        deleted_at = datetime.now(timezone.utc).isoformat()
+        for product in deleted:
+            add_outbox_event(
+                db,
+                PRODUCT_DELETED,
+                {**product_payload(product), "deleted_at": deleted_at},
+            )
+        await db.commit()
+
+    except Exception:
+        await db.rollback()
+        logger.exception("Error deleting products batch")
+        raise HTTPException(
+            status_code=500, detail="Erreur lors de la suppression des produits"
+        )
+
+    deleted_ids = {p.id for p in deleted}
+    for pid in deleted_ids:
+        invalidate_product(pid)
+    await dispatch_outbox(request.app, db)
+
+    return batch_result(
+        [
+            (
+                BatchItemResult(index=index, status=200, id=pid)
+                if pid in deleted_ids
+                else BatchItemResult(
+                    index=index, status=404, id=pid, error="Produit non trouvé"
+                )
+            )
+            for index, pid in enumerate(payload.ids)
+        ]
+    )
+
+
+def may_cache(session_factory) -> bool:
+    """Faux pour une lecture du réplica peu après une écriture
+
+    Le réplica peut encore renvoyer l'ancienne ligne : en cache, elle serait
+    servie à tous les clients jusqu'à expiration.
+    """
+    return not reads_replica(session_factory) or not invalidated_within(
+        READ_YOUR_WRITES_SECONDS
+    )
+
+
+async def fetch_products(
+    db: AsyncSession, ids: List[int], cache: bool = True
+) -> Dict[int, Product]:
+    """Charge des produits par id (WHERE id = ANY) et les met en cache
+
+    Rien n'est mis en cache si une invalidation a eu lieu pendant la requête :
+    la ligne lue peut être antérieure à l'écriture.
+    """
+    started = generation()
+    products = await db.scalars(
+        select(ProductModel).where(
+            ProductModel.id == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+        )
+    )
+    cache = cache and generation() == started
+    found = {}
+    for product in products:
+        found[product.id] = Product.model_validate(product)
+        if cache:
+            product_cache.set(product.id, found[product.id])
+    return found
+
+
+async def _load_products(session_factory, ids: List[int]) -> Dict[int, Product]:
+    async with session_factory() as db:
+        return await fetch_products(db, ids, cache=may_cache(session_factory))
+
+
+# Lectures unitaires concurrentes regroupées en une requête par fenêtre
+product_loader = BatchLoader(
+    _load_products,
+    window=float(os.getenv("PRODUCT_LOADER_WINDOW_MS", "2")) / 1000,
+    max_batch=int(os.getenv("PRODUCT_LOADER_MAX_BATCH", "100")),
+)
+# Après une écriture, pas de ralliement à une lecture commencée avant
+on_invalidate(product_loader.forget)
+
+
+def parse_ids(ids: Optional[str] = None) -> Optional[List[int]]:
+    """Identifiants passés en query string, séparés par des virgules"""
+    if ids is None:
+        return None
+    try:
+        return [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=422,
+            detail="ids doit être une liste d'entiers séparés par des virgules",
+        )
+
+
+async def lookup_products(
+    db: AsyncSession,
+    ids: List[int],
+    read_cache: bool = True,
+    fill_cache: bool = True,
+) -> ProductPage:
+    """Produits demandés dans l'ordre de la requête, une seule requête SQL
+
+    Les produits déjà en cache ne sont pas relus (sauf read_cache=False). Le reste est chargé avec
+    WHERE id = ANY(:ids) : un seul paramètre tableau, donc une seule
+    instruction préparée quel que soit le nombre d'identifiants.
+    """
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Trop d'identifiants (maximum {MAX_BATCH_IDS})",
+        )
+
+    found = {}
+    if read_cache:
+        for product_id in ids:
+            cached = product_cache.get(product_id)
+            if cached is not None:
+                found[product_id] = cached
+
+    to_load = [product_id for product_id in ids if product_id not in found]
+    if to_load:
+        found.update(await fetch_products(db, to_load, cache=fill_cache))
+
+    return ProductPage(
+        items=[found[product_id] for product_id in ids if product_id in found],
+        missing_ids=[product_id for product_id in ids if product_id not in found],
+    )
+
+
+@router.post("/products:lookup", response_model=ProductPage)
+async def lookup_products_by_ids(
+    payload: ProductIds,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    _: HTTPAuthorizationCredentials = Security(verify_token),
+):
+    """Recherche par identifiants, variante POST pour les grands ensembles"""
+    return await lookup_products(
+        db, payload.ids, read_cache=not reads_from_primary(request)
+    )
+
+
+@router.get("/products", response_model=ProductPage)
+async def list_products(
+    request: Request,
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    filters: ProductFilters = Depends(product_filters),
+    ids: Optional[List[int]] = Depends(parse_ids),
+    session_factory=Depends(get_read_session_factory),
+    db: AsyncSession = Depends(get_read_db),
+    _: HTTPAuthorizationCredentials = Security(verify_token),
+):
+    """Liste paginée par curseur (keyset sur id) : coût constant quelle que soit la page
+
+    Sauf avec min_price/max_price : l'intervalle de prix est trié sur id à
+    chaque page, pour un coût proportionnel à sa taille.
+    Avec ids=1,2,3 : recherche par identifiants (pagination et filtres ignorés).
+    Un client qui vient d'écrire ne lit pas les caches (read-your-writes).
+    """
+    read_cache = not reads_from_primary(request)
+    fill_cache = may_cache(session_factory)
+    if ids is not None:
+        return await lookup_products(db, ids, read_cache, fill_cache)
+
+    cache_key = (cursor, limit, filters)
+    cached = page_cache.get(cache_key) if read_cache else None
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    started = generation()
+    # Colonnes seules : des tuples encodés directement, sans ORM ni Pydantic
+    stmt = apply_product_filters(select(*PRODUCT_COLUMNS), filters)
+    if cursor is not None:
+        stmt = stmt.where(ProductModel.id > cursor)
+    # Une ligne de plus que demandé pour savoir s'il existe une page suivante
+    stmt = stmt.order_by(ProductModel.id).limit(limit + 1)
+
+    items = [product_row(row) for row in (await db.execute(stmt)).all()]
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = items[-1]["id"]
+
+    body = dumps({"items": items, "next_cursor": next_cursor, "missing_ids": None})
+    # Page invalidée pendant la lecture : elle peut être périmée
+    if fill_cache and generation() == started:
+        page_cache.set(cache_key, body)
+    return Response(content=body, media_type="application/json")
+
+
+def export_fields(fields: Optional[str] = None) -> list:
+    """Champs exportés, pris dans le schéma Product (tous par défaut)"""
+    if not fields:
+        return list(Product.model_fields)
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in Product.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=422, detail=f"Champs inconnus : {', '.join(unknown)}"
+        )
+    return selected
+
+
+def csv_value(value):
+    """Dates au même format que dans le JSON de l'API"""
+    if isinstance(value, datetime):
+        return dumps(value)[1:-1].decode()
+    return value
+
+
+async def iter_export(session_factory, filters: ProductFilters, fields: list, fmt: str):
+    """Génère l'export par lots via un curseur serveur : mémoire constante"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        yield buffer.getvalue()
+
+    stmt = apply_product_filters(select(*product_columns(fields)), filters).order_by(
+        ProductModel.id
+    )
+    async with session_factory() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.partitions():
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows([[csv_value(v) for v in row] for row in batch])
+                yield buffer.getvalue()
+            else:
+                yield b"".join(dumps(product_row(row, fields)) + b"\n" for row in batch)
+
+
+@router.get("/products/export")
+async def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    fields: list = Depends(export_fields),
+    filters: ProductFilters = Depends(product_filters),
+    session_factory=Depends(get_read_session_factory),
     _: HTTPAuthorizationCredentials = Security(verify_token),
 ):
-    return db.query(ProductModel).all()
+    """Export complet du catalogue en flux NDJSON ou CSV"""
+    return StreamingResponse(
+        iter_export(session_factory, filters, fields, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+
+def product_etag(product) -> str:
+    """ETag faible dérivé de l'id et de la version du produit"""
+    return f'W/"{product.id}-{product.version}"'
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparaison faible (RFC 9110) pour If-None-Match"""
+    if not if_none_match:
+        return False
+    tags = [_opaque_tag(tag) for tag in if_none_match.split(",")]
+    return "*" in tags or _opaque_tag(etag) in tags
+
+
+def if_match_condition(product_id: int, if_match: Optional[str]):
+    """Condition SQL sur la version tirée d'If-Match, None sans précondition
+
+    Les ETags étant faibles, la comparaison se fait sur la version : un
+    UPDATE/DELETE conditionnel, sans verrou ni lecture préalable.
+    """
+    if if_match is None:
+        return None
+    tags = [_opaque_tag(tag) for tag in if_match.split(",")]
+    if "*" in tags:
+        return None
+    versions = []
+    for tag in tags:
+        tag_id, _, version = tag.strip('"').partition("-")
+        if tag_id == str(product_id) and version.isdigit():
+            versions.append(int(version))
+    return ProductModel.version.in_(versions)
+
+
+async def missing_or_precondition_failed(db: AsyncSession, product_id: int):
+    """Chemin d'échec d'une écriture conditionnelle : 404 ou 412"""
+    exists = await db.scalar(
+        select(ProductModel.id).where(ProductModel.id == product_id)
+    )
+    await db.rollback()
+    if exists is None:
+        raise HTTPException(status_code=404, detail="Produit non trouvé")
+    raise HTTPException(status_code=412, detail="Le produit a été modifié entre-temps")
+
+
+@router.get("/products/changes", response_model=ChangePage)
+async def list_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    _: HTTPAuthorizationCredentials = Security(verify_token),
+):
+    """Produits modifiés ou supprimés depuis le curseur, par pages bornées
+
+    Le journal ne garde que le dernier changement de chaque produit : une
+    resynchronisation coûte O(changements), jamais O(catalogue). Repartir de
+    next_cursor tant que has_more est vrai ; since=0 donne l'état complet.
+    """
+    rows = (
+        await db.execute(
+            select(ProductChangeModel, ProductModel)
+            .outerjoin(ProductModel, ProductModel.id == ProductChangeModel.product_id)
+            .where(ProductChangeModel.seq > since)
+            .where(ProductChangeModel.changed_at <= func.now() - CHANGE_FEED_SETTLE)
+            .order_by(ProductChangeModel.seq)
+            .limit(limit + 1)
+        )
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return ChangePage(
+        changes=[
+            ProductChange(
+                seq=change.seq,
+                product_id=change.product_id,
+                op=change.op,
+                changed_at=change.changed_at,
+                product=Product.model_validate(product) if product else None,
+            )
+            for change, product in rows
+        ],
+        next_cursor=rows[-1][0].seq if rows else since,
+        has_more=has_more,
+    )
+
+
+@router.get("/products/catalog")
+async def get_catalog(
+    request: Request,
+    session_factory=Depends(get_session_factory),
+    _: HTTPAuthorizationCredentials = Security(verify_token),
+):
+    """Catalogue complet depuis le snapshot en mémoire (ETag fort, pré-compressé)"""
+    snapshot = await catalog_snapshot.get(session_factory)
+    headers = {"ETag": snapshot.etag, "Vary": "Accept-Encoding"}
+
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        snapshot.not_modified += 1
+        return Response(status_code=304, headers=headers)
+
+    body, encoding = snapshot.encoded(request.headers.get("accept-encoding"))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    snapshot.served += 1
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/products/{product_id}", response_model=Product)
-def get_product(
+async def get_product(
     product_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    session_factory=Depends(get_read_session_factory),
+    if_none_match: Optional[str] = Header(None),
     _: HTTPAuthorizationCredentials = Security(verify_token),
 ):
-    product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
-    if not product:
+    """Lecture unitaire : cache, puis chargement coalescé avec les lectures concurrentes
+
+    Un client qui vient d'écrire ne lit pas le cache (read-your-writes).
+    Renvoie un ETag faible ; If-None-Match correspondant : 304 sans corps.
+    """
+    product = None
+    if not reads_from_primary(request):
+        product = product_cache.get(product_id)
+    if product is None:
+        product = await product_loader.load(product_id, session_factory)
+    if product is None:
         raise HTTPException(status_code=404, detail="Produit non trouvé")
+
+    etag = product_etag(product)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return product
 
 
@@ -99,90 +816,145 @@ async def update_product(
     product_id: int,
     updated_product: ProductUpdate,
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    if_match: Optional[str] = Header(None),
     _: HTTPAuthorizationCredentials = Security(verify_token),
 ):
+    """Mise à jour, conditionnelle à la version si If-Match est fourni (sinon 412)"""
     try:
-        product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail="Produit non trouvé")
-
-        old_values = {
-            "name": product.name,
-            "price": float(product.price),
-            "description": product.description,
-            "color": product.color,
-            "stock": product.stock,
-        }
-
         changes = updated_product.model_dump(exclude_unset=True)
-        for field, value in changes.items():
-            setattr(product, field, value)
-
-        db.commit()
-        db.refresh(product)
+        where = ProductModel.id == product_id
+        condition = if_match_condition(product_id, if_match)
+        if condition is not None:
+            where = where & condition
+        row = (await db.execute(update_returning_old(where, changes))).one_or_none()
+        if row is None:
+            if condition is not None:
+                await missing_or_precondition_failed(db, product_id)
+            raise HTTPException(status_code=404, detail="Produit non trouvé")
 
-        await publish_event_safe(
-            request,
+        product = row[0]
+        add_outbox_event(
+            db,
             PRODUCT_UPDATED,
             {
-                "product_id": product.id,
-                "name": product.name,
-                "price": float(product.price),
-                "description": product.description,
-                "color": product.color,
-                "stock": product.stock,
+                **product_payload(product),
                 "changes": changes,
-                "old_values": old_values,
+                "old_values": row_old_values(row),
             },
         )
+        await db.commit()
+        invalidate_product(product_id)
+        await dispatch_outbox(request.app, db)
 
+        response.headers["ETag"] = product_etag(product)
         return product
 
     except HTTPException:
         raise
-    except Exception as e:
-        db.rollback()
-        print(f"Error updating product: {str(e)}")
+    except Exception:
+        await db.rollback()
+        logger.exception("Error updating product")
         raise HTTPException(
             status_code=500, detail="Erreur lors de la mise à jour du produit"
         )
 
 
+@router.post("/products/{product_id}/stock", response_model=StockLevel)
+async def change_stock(
+    product_id: int,
+    stock_delta: StockDelta,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    _: HTTPAuthorizationCredentials = Security(verify_token),
+):
+    """Variation atomique du stock : un UPDATE conditionnel, sans lecture préalable"""
+    try:
+        new_stock = func.coalesce(ProductModel.stock, 0) + stock_delta.delta
+        stmt = (
+            update(ProductModel)
+            .where(ProductModel.id == product_id)
+            .values(stock=new_stock, **version_bump())
+            .returning(ProductModel.stock)
+            .execution_options(synchronize_session=False)
+        )
+        if not stock_delta.allow_negative:
+            stmt = stmt.where(new_stock >= 0)
+
+        stock = (await db.execute(stmt)).scalar_one_or_none()
+        if stock is None:
+            # Chemin d'échec seulement : distinguer produit absent et stock insuffisant
+            exists = await db.scalar(
+                select(ProductModel.id).where(ProductModel.id == product_id)
+            )
+            await db.rollback()
+            if exists is None:
+                raise HTTPException(status_code=404, detail="Produit non trouvé")
+            raise HTTPException(status_code=409, detail="Stock insuffisant")
+
+        add_outbox_event(
+            db,
+            PRODUCT_STOCK_CHANGED,
+            {"product_id": product_id, "delta": stock_delta.delta, "stock": stock},
+        )
+        await db.commit()
+        invalidate_product(product_id)
+        await dispatch_outbox(request.app, db)
+
+        return StockLevel(product_id=product_id, stock=stock, delta=stock_delta.delta)
+
+    except HTTPException:
+        raise
+    except Exception:
+        await db.rollback()
+        logger.exception("Error changing stock")
+        raise HTTPException(
+            status_code=500, detail="Erreur lors de la mise à jour du stock"
+        )
+
+
 @router.delete("/products/{product_id}", response_model=dict)
 async def delete_product(
     product_id: int,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    if_match: Optional[str] = Header(None),
     _: HTTPAuthorizationCredentials = Security(verify_token),
 ):
     try:
-        product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
-        if not product:
+        # DELETE ... RETURNING : la ligne supprimée alimente l'événement
+        stmt = delete(ProductModel).where(ProductModel.id == product_id)
+        condition = if_match_condition(product_id, if_match)
+        if condition is not None:
+            stmt = stmt.where(condition)
+        product = await db.scalar(
+            stmt.returning(ProductModel).execution_options(synchronize_session=False)
+        )
+        if product is None:
+            if condition is not None:
+                await missing_or_precondition_failed(db, product_id)
             raise HTTPException(status_code=404, detail="Produit non trouvé")
 
-        product_data = {
-            "product_id": product.id,
-            "name": product.name,
-            "price": float(product.price),
-            "description": product.description,
-            "color": product.color,
-            "stock": product.stock,
-            "deleted_at": datetime.now(timezone.utc).isoformat(),
-        }
-
-        db.delete(product)
-        db.commit()
-
-        await publish_event_safe(request, PRODUCT_DELETED, product_data)
+        add_outbox_event(
+            db,
+            PRODUCT_DELETED,
+            {
+                **product_payload(product),
+                "deleted_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+        await db.commit()
+        invalidate_product(product_id)
+        await dispatch_outbox(request.app, db)
 
         return {"message": "Produit supprimé avec succès"}
 
     except HTTPException:
         raise
-    except Exception as e:
-        db.rollback()
-        print(f"Error deleting product: {str(e)}")
+    except Exception:
+        await db.rollback()
+        logger.exception("Error deleting product")
         raise HTTPException(
             status_code=500, detail="Erreur lors de la suppression du produit"
         )
@@ -194,10 +966,18 @@ async def check_messaging_health(request: Request):
     try:
         broker = getattr(request.app.state, "broker", None)
         if broker and broker.is_connected:
+            relay = getattr(request.app.state, "outbox_relay", None)
             return {
                 "status": "healthy",
                 "message_broker": "connected",
                 "service": broker.service_name,
+                "outbox": relay.stats() if relay else None,
+                "publisher": broker.publish_stats(),
+                "dispatcher": (
+                    request.app.state.event_dispatcher.stats()
+                    if hasattr(request.app.state, "event_dispatcher")
+                    else None
+                ),
             }
         else:
             return {
@@ -207,3 +987,73 @@ async def check_messaging_health(request: Request):
             }
     except Exception as e:
         return {"status": "error", "message_broker": "error", "error": str(e)}
+
+
+@router.get("/health/cache")
+async def check_cache_health(_: HTTPAuthorizationCredentials = Security(verify_token)):
+    """Statistiques du cache de lecture (succès, échecs, évictions)"""
+    return {
+        **cache_stats(),
+        "loader": product_loader.stats(),
+        "catalog": catalog_snapshot.stats(),
+    }
+
+
+@router.get("/debug/profiles")
+async def list_profiles(_: HTTPAuthorizationCredentials = Security(verify_token)):
+    """Résumés des derniers profils (X-Profile: 1 ou échantillonnage)"""
+    profiles = sorted(profile_store.values(), key=lambda p: p.started_at, reverse=True)
+    return [profile.summary() for profile in profiles]
+
+
+@router.get("/debug/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str, _: HTTPAuthorizationCredentials = Security(verify_token)
+):
+    """Profil complet : requêtes SQL, répétitions (N+1), piles échantillonnées"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profil non trouvé")
+    return profile.report()
+
+
+@router.get("/health/db")
+async def check_db_health(_: HTTPAuthorizationCredentials = Security(verify_token)):
+    """Pools de connexions (attente d'emprunt, saturation) et retard du réplica"""
+    replica_lag, replica_error = None, None
+    if replica_enabled():
+        try:
+            async with read_engine.connect() as conn:
+                lag = await conn.scalar(
+                    select(
+                        func.extract(
+                            "epoch",
+                            func.now() - func.pg_last_xact_replay_timestamp(),
+                        )
+                    )
+                )
+            replica_lag = float(lag) if lag is not None else None
+        except Exception as e:
+            replica_error = str(e)
+    return {
+        "replica": replica_enabled(),
+        "replica_lag_seconds": replica_lag,
+        "replica_error": replica_error,
+        "pools": pool_stats(),
+    }
+
+
+@router.get("/health/consumer")
+async def check_consumer_health(
+    request: Request, _: HTTPAuthorizationCredentials = Security(verify_token)
+):
+    """Débit, lots et retard du consommateur d'événements externes"""
+    consumer = getattr(request.app.state, "consumer", None)
+    if consumer is None:
+        return {"status": "stopped"}
+
+    try:
+        queue_depth = await consumer.queue_depth()
+    except Exception:
+        queue_depth = None
+    return {"status": "running", "queue_depth": queue_depth, **consumer.stats()}
@@ -1,5 +1,5 @@
 # app/schemas.py
-from typing import Optional
+from typing import Any, List, Optional
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 
@@ -27,3 +27,69 @@ class ProductUpdate(BaseModel):
 class Product(ProductBase):
     id: Optional[int] = None
     created_at: Optional[datetime] = None
+    version: Optional[int] = None
+    updated_at: Optional[datetime] = None
+
+
+class ProductFilters(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    color: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    in_stock: bool = False
+
+
+class ProductPage(BaseModel):
+    items: List[Product]
+    next_cursor: Optional[int] = None
+    # Recherche par ids uniquement : identifiants demandés mais introuvables
+    missing_ids: Optional[List[int]] = None
+
+
+class ProductChange(BaseModel):
+    seq: int
+    product_id: int
+    op: str
+    changed_at: datetime
+    # État courant du produit, absent pour une suppression
+    product: Optional[Product] = None
+
+
+class ChangePage(BaseModel):
+    changes: List[ProductChange]
+    next_cursor: int
+    has_more: bool
+
+
+class ProductBatchUpdate(ProductUpdate):
+    id: int
+
+
+class ProductIds(BaseModel):
+    ids: List[int]
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: int
+    id: Optional[int] = None
+    product: Optional[Product] = None
+    error: Optional[Any] = None
+
+
+class BatchResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
+
+class StockDelta(BaseModel):
+    delta: int
+    allow_negative: bool = False
+
+
+class StockLevel(BaseModel):
+    product_id: int
+    stock: int
+    delta: int
@@ -0,0 +1,40 @@
+# app/serialization.py
+from typing import Any, Sequence
+
+import orjson
+from sqlalchemy import Float, cast
+
+from app.models import ProductModel
+from app.schemas import Product
+
+# Champs de l'API, dans l'ordre du schéma Product
+PRODUCT_FIELDS = tuple(Product.model_fields)
+
+
+def product_columns(fields: Sequence[str] = PRODUCT_FIELDS) -> list:
+    """Colonnes à sélectionner pour obtenir des tuples prêts à encoder
+
+    Le prix est converti en float8 côté PostgreSQL : pas de Decimal à
+    convertir en Python, ni d'objet ORM à hydrater.
+    """
+    return [
+        (
+            cast(ProductModel.price, Float).label("price")
+            if field == "price"
+            else getattr(ProductModel, field)
+        )
+        for field in fields
+    ]
+
+
+PRODUCT_COLUMNS = product_columns()
+
+
+def product_row(row: Sequence[Any], fields: Sequence[str] = PRODUCT_FIELDS) -> dict:
+    """Tuple issu de product_columns() vers le dict JSON de l'API, sans validation"""
+    return dict(zip(fields, row))
+
+
+def dumps(content: Any) -> bytes:
+    """Encodage orjson, dates UTC en "Z" comme la sérialisation Pydantic"""
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
@@ -0,0 +1,68 @@
+# app/startup.py
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _process_age() -> Optional[float]:
+    """Âge du processus en secondes (Linux), interpréteur et imports compris"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Le nom de commande (2e champ) peut contenir des espaces
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return max(uptime - started, 0.0)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """Durée des étapes du démarrage, mesurée depuis le lancement du processus
+
+    Sans /proc, l'origine est l'import de ce module.
+    """
+
+    def __init__(self):
+        self.origin = time.monotonic() - (_process_age() or 0.0)
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, phase: str):
+        """Note la première occurrence d'une étape (les suivantes sont ignorées)"""
+        if phase in self.phases:
+            return
+        elapsed = time.monotonic() - self.origin
+        self.phases[phase] = elapsed
+        logger.info(
+            "Startup phase %s reached after %.3f s",
+            phase,
+            elapsed,
+            extra={"phase": phase, "elapsed_s": round(elapsed, 3)},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "uptime_s": round(time.monotonic() - self.origin, 3),
+            "phases_s": {phase: round(s, 3) for phase, s in self.phases.items()},
+        }
+
+
+startup = StartupTimer()
+
+
+class FirstRequestMiddleware:
+    """Middleware ASGI : note l'arrivée de la première requête HTTP"""
+
+    def __init__(self, app):
+        self.app = app
+        self._seen = False
+
+    async def __call__(self, scope, receive, send):
+        if not self._seen and scope["type"] == "http":
+            self._seen = True
+            startup.mark("first_request")
+        await self.app(scope, receive, send)
@@ -0,0 +1,151 @@
+# benchmarks/serialization.py
+"""Micro-benchmark: product list serialization, current path vs fast path
+
+Current path: ORM objects -> Product.model_validate -> response_model
+validation -> JSON mode dump -> json.dumps (what FastAPI does for a
+response_model route).
+Fast path: column tuples -> dict -> orjson.
+
+    python -m benchmarks.serialization            # serialization only
+    python -m benchmarks.serialization --database # + SELECT on DATABASE_URL
+
+With --database, tables and rows are created in a transaction that is
+rolled back at the end.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+
+from app.db import Base, to_async_url
+from app.models import ProductModel
+from app.schemas import Product, ProductPage
+from app.serialization import PRODUCT_COLUMNS, PRODUCT_FIELDS, dumps, product_row
+
+SIZES = (1, 100, 10_000)
+page_adapter = TypeAdapter(ProductPage)
+
+
+def current_path(products) -> bytes:
+    page = ProductPage(items=[Product.model_validate(p) for p in products])
+    # FastAPI revalide la valeur renvoyée contre response_model avant l'encodage
+    validated = page_adapter.validate_python(page)
+    content = page_adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def fast_path(rows) -> bytes:
+    return dumps(
+        {
+            "items": [product_row(row) for row in rows],
+            "next_cursor": None,
+            "missing_ids": None,
+        }
+    )
+
+
+def synthetic(size: int):
+    now = datetime.now(timezone.utc)
+    values = [
+        {
+            "id": i,
+            "name": f"Produit {i}",
+            "price": Decimal("12.34"),
+            "description": "Café de spécialité",
+            "color": "Rouge",
+            "stock": i % 50,
+            "created_at": now,
+            "version": 1,
+            "updated_at": now,
+        }
+        for i in range(1, size + 1)
+    ]
+    objects = [ProductModel(**v) for v in values]
+    rows = [
+        tuple(float(v[f]) if f == "price" else v[f] for f in PRODUCT_FIELDS)
+        for v in values
+    ]
+    return objects, rows
+
+
+def timed(func, *args, repeat: int) -> float:
+    """Médiane en millisecondes"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def repeat_for(size: int) -> int:
+    return max(5, min(2000, 200_000 // size))
+
+
+def run_serialization():
+    print(f"{'products':>9} {'current ms':>11} {'fast ms':>9} {'speedup':>8}")
+    for size in SIZES:
+        objects, rows = synthetic(size)
+        assert json.loads(current_path(objects)) == json.loads(fast_path(rows))
+        repeat = repeat_for(size)
+        current = timed(current_path, objects, repeat=repeat)
+        fast = timed(fast_path, rows, repeat=repeat)
+        print(f"{size:>9} {current:>11.3f} {fast:>9.3f} {current / fast:>7.1f}x")
+
+
+async def run_database():
+    from sqlalchemy import insert, select
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    engine = create_async_engine(to_async_url(os.environ["DATABASE_URL"]))
+    print(f"{'products':>9} {'current ms':>11} {'fast ms':>9} {'speedup':>8}")
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        session = AsyncSession(bind=conn)
+        try:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(
+                insert(ProductModel),
+                [
+                    {"name": f"Bench {i}", "price": Decimal("12.34"), "stock": i}
+                    for i in range(max(SIZES))
+                ],
+            )
+            for size in SIZES:
+                orm_stmt = select(ProductModel).order_by(ProductModel.id).limit(size)
+                fast_stmt = (
+                    select(*PRODUCT_COLUMNS).order_by(ProductModel.id).limit(size)
+                )
+                current, fast = [], []
+                for _ in range(max(3, repeat_for(size) // 20)):
+                    started = time.perf_counter()
+                    # Hydratation ORM comme dans la route d'origine
+                    current_path((await session.scalars(orm_stmt)).all())
+                    session.expunge_all()
+                    current.append((time.perf_counter() - started) * 1000)
+
+                    started = time.perf_counter()
+                    fast_path((await conn.execute(fast_stmt)).all())
+                    fast.append((time.perf_counter() - started) * 1000)
+                c, f = statistics.median(current), statistics.median(fast)
+                print(f"{size:>9} {c:>11.3f} {f:>9.3f} {c / f:>7.1f}x")
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", action="store_true")
+    args = parser.parse_args()
+    if args.database:
+        asyncio.run(run_database())
+    else:
+        run_serialization()
@@ -0,0 +1,38 @@
+"""initial schema
+
+Table products telle que créée par Base.metadata.create_all dans la
+première version de l'API. Toute base existante créée ainsi :
+alembic stamp 0001, puis alembic upgrade head.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 07:56:28.947619
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "products",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("price", sa.Numeric(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("color", sa.String(), nullable=True),
+        sa.Column("stock", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_products_id"), "products", ["id"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_products_id"), table_name="products")
+    op.drop_table("products")
@@ -0,0 +1,39 @@
+"""product listing indexes
+
+Index des filtres de GET /products, terminés par id pour la pagination
+keyset. IF NOT EXISTS : une base créée plus tard par create_all les a déjà.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 07:57:40.118204
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_products_color_id", "products", ["color", "id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_products_price_id", "products", ["price", "id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_products_in_stock_id",
+        "products",
+        ["id"],
+        if_not_exists=True,
+        postgresql_where=sa.text("stock > 0"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_products_in_stock_id", table_name="products")
+    op.drop_index("ix_products_price_id", table_name="products")
+    op.drop_index("ix_products_color_id", table_name="products")
@@ -0,0 +1,49 @@
+"""products.created_at as timestamptz
+
+Les valeurs existantes ont été écrites en UTC (datetime.now(timezone.utc)
+dans une colonne sans fuseau) : elles sont converties comme telles. Colonne
+déjà avec fuseau (table créée plus tard par create_all) : rien à faire.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 07:58:52.630517
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Test en SQL plutôt qu'en Python : fonctionne aussi hors ligne (--sql)
+    op.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                  AND table_name = 'products'
+                  AND column_name = 'created_at'
+                  AND data_type = 'timestamp without time zone'
+            ) THEN
+                ALTER TABLE products ALTER COLUMN created_at
+                    TYPE TIMESTAMP WITH TIME ZONE
+                    USING created_at AT TIME ZONE 'UTC';
+            END IF;
+        END $$
+        """)
+
+
+def downgrade():
+    op.alter_column(
+        "products",
+        "created_at",
+        type_=sa.DateTime(),
+        existing_type=sa.DateTime(timezone=True),
+        existing_nullable=False,
+        postgresql_using="created_at AT TIME ZONE 'UTC'",
+    )
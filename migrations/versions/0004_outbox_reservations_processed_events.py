@@ -0,0 +1,98 @@
+"""outbox, stock reservations and processed events
+
+Outbox transactionnelle des événements publiés, réservations de stock
+par commande et événements externes déjà traités (dédoublonnage).
+IF NOT EXISTS : create_all les créait au démarrage avant les migrations.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 08:00:17.294861
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "outbox_events",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("event_id", sa.String(length=36), nullable=False),
+        sa.Column("event_type", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("published_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("event_id"),
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_outbox_events_pending",
+        "outbox_events",
+        ["id"],
+        if_not_exists=True,
+        postgresql_where=sa.text("published_at IS NULL"),
+    )
+    op.create_index(
+        "ix_outbox_events_published_at",
+        "outbox_events",
+        ["published_at"],
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        "stock_reservations",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("order_id", sa.String(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("released_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "order_id", "product_id", name="uq_stock_reservations_order_product"
+        ),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        "processed_events",
+        sa.Column("event_id", sa.String(length=64), nullable=False),
+        sa.Column("event_type", sa.String(), nullable=False),
+        sa.Column(
+            "processed_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("event_id"),
+        if_not_exists=True,
+    )
+    op.create_index(
+        op.f("ix_processed_events_processed_at"),
+        "processed_events",
+        ["processed_at"],
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        op.f("ix_processed_events_processed_at"), table_name="processed_events"
+    )
+    op.drop_table("processed_events")
+    op.drop_table("stock_reservations")
+    op.drop_index("ix_outbox_events_published_at", table_name="outbox_events")
+    op.drop_index("ix_outbox_events_pending", table_name="outbox_events")
+    op.drop_table("outbox_events")
@@ -0,0 +1,80 @@
+"""product versions and change log
+
+Colonnes version / updated_at (ETag, If-Match) et journal compacté
+product_changes du flux de changements. IF NOT EXISTS : create_all a pu
+créer le journal (mais pas les colonnes) sur une base existante.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 08:02:11.402318
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "products",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+        if_not_exists=True,
+    )
+    # Colonne ajoutée ici seulement : produits existants, dernière modification
+    # connue = création. Test en SQL : fonctionne aussi hors ligne (--sql)
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                  AND table_name = 'products'
+                  AND column_name = 'updated_at'
+            ) THEN
+                ALTER TABLE products ADD COLUMN updated_at
+                    TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL;
+                UPDATE products SET updated_at = created_at;
+            END IF;
+        END $$
+        """)
+
+    op.execute(
+        sa.schema.CreateSequence(sa.Sequence("product_changes_seq"), if_not_exists=True)
+    )
+    op.create_table(
+        "product_changes",
+        sa.Column("product_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column(
+            "seq",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('product_changes_seq')"),
+            nullable=False,
+        ),
+        sa.Column("op", sa.String(length=10), nullable=False),
+        sa.Column(
+            "changed_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("clock_timestamp()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("product_id"),
+        sa.UniqueConstraint("seq"),
+        if_not_exists=True,
+    )
+    # Un consommateur qui part du curseur 0 reçoit aussi les produits existants
+    op.execute(
+        "INSERT INTO product_changes (product_id, op) "
+        "SELECT id, 'upsert' FROM products ORDER BY id "
+        "ON CONFLICT (product_id) DO NOTHING"
+    )
+
+
+def downgrade():
+    op.drop_table("product_changes")
+    op.execute(sa.schema.DropSequence(sa.Sequence("product_changes_seq")))
+    op.drop_column("products", "updated_at")
+    op.drop_column("products", "version")
@@ -2,9 +2,18 @@
 import pytest
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from app.db import Base, get_db
+from sqlalchemy.pool import NullPool
+from app.db import (
+    Base,
+    get_db,
+    get_session_factory,
+    get_read_session_factory,
+    to_async_url,
+)
 from app.main import app
+from app.cache import clear_caches
 from starlette.testclient import TestClient
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
@@ -29,6 +38,16 @@ def db_session(db_engine):
     session.close()
 
 
+@pytest.fixture(scope="function")
+def async_session_factory(db_engine):
+    # NullPool : le TestClient ouvre une boucle d'événements par requête,
+    # une connexion asyncpg ne doit pas survivre à la boucle qui l'a créée
+    engine = create_async_engine(
+        to_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool
+    )
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+
+
 @pytest.fixture(scope="function")
 def auth_headers():
     """Provide authentication headers for tests"""
@@ -37,13 +56,19 @@ def auth_headers():
 
 
 @pytest.fixture(scope="function")
-def client(db_session):
-    def override_get_db():
-        yield db_session
+def client(async_session_factory):
+    async def override_get_db():
+        async with async_session_factory() as session:
+            yield session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: async_session_factory
+    app.dependency_overrides[get_read_session_factory] = lambda: async_session_factory
+    # Les tables sont recréées à chaque test : le cache ne doit pas survivre
+    clear_caches()
     yield TestClient(app)
     app.dependency_overrides.clear()
+    clear_caches()
 
 
 @pytest.fixture(scope="function")
@@ -1,3 +1,8 @@
+import io
+import csv
+import json
+
+
 # tests/test_api.py
 class TestProductAPI:
     """Test suite for Product API endpoints"""
@@ -57,9 +62,323 @@ class TestProductAPI:
         response = client.get("/products", headers=auth_headers)
         assert response.status_code == 200
 
-        products_list = response.json()
-        assert isinstance(products_list, list)
-        assert len(products_list) >= len(products_data)
+        page = response.json()
+        assert isinstance(page["items"], list)
+        assert len(page["items"]) >= len(products_data)
+        assert page["next_cursor"] is None
+
+    def test_list_products_keyset_pagination(self, client, auth_headers):
+        """Test walking the catalog page by page with next_cursor"""
+        created = TestProductUtilities.create_products_batch(
+            client, auth_headers, count=5
+        )
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor is not None:
+                params["cursor"] = cursor
+            response = client.get("/products", params=params, headers=auth_headers)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page["items"]) <= 2
+            seen.extend(p["id"] for p in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+        assert seen == sorted(p["id"] for p in created)
+
+    def test_list_products_limit_bounds(self, client, auth_headers):
+        """Test that page size is bounded"""
+        response = client.get("/products?limit=0", headers=auth_headers)
+        assert response.status_code == 422
+        response = client.get("/products?limit=100000", headers=auth_headers)
+        assert response.status_code == 422
+
+    def test_list_products_filters(self, client, auth_headers):
+        """Test server-side filters on color, price range and stock"""
+        TestProductUtilities.create_test_product(
+            client, auth_headers, name="Rouge", color="Rouge", price=5.0, stock=0
+        )
+        TestProductUtilities.create_test_product(
+            client, auth_headers, name="Bleu", color="Bleu", price=15.0, stock=3
+        )
+        TestProductUtilities.create_test_product(
+            client, auth_headers, name="Bleu cher", color="Bleu", price=50.0, stock=1
+        )
+
+        response = client.get("/products?color=Bleu", headers=auth_headers)
+        assert {p["name"] for p in response.json()["items"]} == {"Bleu", "Bleu cher"}
+
+        response = client.get(
+            "/products?min_price=10&max_price=20", headers=auth_headers
+        )
+        assert [p["name"] for p in response.json()["items"]] == ["Bleu"]
+
+        response = client.get("/products?in_stock=true", headers=auth_headers)
+        assert {p["name"] for p in response.json()["items"]} == {"Bleu", "Bleu cher"}
+
+    def test_list_products_matches_single_product(self, client, auth_headers):
+        """Test list items (fast path) are identical to the single product JSON"""
+        data = {"name": "Produit Détail", "price": 12.5, "color": "Bleu", "stock": 3}
+        created = client.post("/products", json=data, headers=auth_headers).json()
+
+        items = client.get("/products", headers=auth_headers).json()["items"]
+        single = client.get(f"/products/{created['id']}", headers=auth_headers)
+        assert items == [single.json()]
+
+    def test_export_products_ndjson(self, client, auth_headers):
+        """Test streaming NDJSON export with filters and field selection"""
+        TestProductUtilities.create_test_product(client, auth_headers, color="Vert")
+        TestProductUtilities.create_test_product(client, auth_headers, color="Noir")
+
+        response = client.get(
+            "/products/export?color=Vert&fields=id,name,color", headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 1
+        assert set(lines[0]) == {"id", "name", "color"}
+        assert lines[0]["color"] == "Vert"
+
+    def test_export_products_csv(self, client, auth_headers):
+        """Test streaming CSV export"""
+        TestProductUtilities.create_products_batch(client, auth_headers, count=3)
+
+        response = client.get(
+            "/products/export?format=csv&fields=name,price", headers=auth_headers
+        )
+        assert response.status_code == 200
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0] == ["name", "price"]
+        assert len(rows) == 4
+
+    def test_export_products_unknown_field(self, client, auth_headers):
+        """Test export rejects fields absent from the Product schema"""
+        response = client.get("/products/export?fields=secret", headers=auth_headers)
+        assert response.status_code == 422
+
+    def test_cached_product_invalidated_on_update(self, client, auth_headers):
+        """Test that a local write invalidates the cached product and pages"""
+        product = TestProductUtilities.create_test_product(client, auth_headers)
+        url = f"/products/{product['id']}"
+
+        assert client.get(url, headers=auth_headers).json()["name"] == "Test Product"
+        client.get("/products", headers=auth_headers)
+
+        response = client.put(url, json={"name": "Renamed"}, headers=auth_headers)
+        assert response.status_code == 200
+
+        assert client.get(url, headers=auth_headers).json()["name"] == "Renamed"
+        names = [
+            p["name"]
+            for p in client.get("/products", headers=auth_headers).json()["items"]
+        ]
+        assert names == ["Renamed"]
+
+        stats = client.get("/health/cache", headers=auth_headers).json()
+        assert stats["products"]["misses"] >= 2
+
+    def test_create_products_batch(self, client, auth_headers):
+        """Test batch creation reports a result per item"""
+        items = [
+            {"name": "Lot 1", "price": 1.0},
+            {"description": "sans nom ni prix"},
+            {"name": "Lot 2", "price": 2.0, "stock": 4},
+        ]
+        response = client.post("/products:batch", json=items, headers=auth_headers)
+        assert response.status_code == 200
+
+        data = response.json()
+        assert data["succeeded"] == 2
+        assert data["failed"] == 1
+        assert [r["status"] for r in data["results"]] == [201, 422, 201]
+        assert data["results"][2]["product"]["stock"] == 4
+
+        listed = client.get("/products", headers=auth_headers).json()["items"]
+        assert [p["name"] for p in listed] == ["Lot 1", "Lot 2"]
+
+    def test_update_products_batch(self, client, auth_headers):
+        """Test batch update applies per-row changes and reports missing ids"""
+        p1, p2 = TestProductUtilities.create_products_batch(
+            client, auth_headers, count=2
+        )
+        items = [
+            {"id": p1["id"], "price": 99.5},
+            {"id": p2["id"], "name": "Renommé", "stock": 0},
+            {"id": 99999, "name": "Fantôme"},
+            {"id": p1["id"], "name": "Doublon"},
+        ]
+        response = client.patch("/products:batch", json=items, headers=auth_headers)
+        assert response.status_code == 200
+
+        results = response.json()["results"]
+        assert [r["status"] for r in results] == [200, 200, 404, 409]
+        assert results[0]["product"]["price"] == 99.5
+        assert results[0]["product"]["name"] == p1["name"]
+        assert results[1]["product"]["name"] == "Renommé"
+        assert results[1]["product"]["stock"] == 0
+
+        response = client.get(f"/products/{p2['id']}", headers=auth_headers)
+        assert response.json()["name"] == "Renommé"
+
+    def test_delete_products_batch(self, client, auth_headers):
+        """Test batch delete in one request"""
+        p1, p2 = TestProductUtilities.create_products_batch(
+            client, auth_headers, count=2
+        )
+        response = client.request(
+            "DELETE",
+            "/products:batch",
+            json={"ids": [p1["id"], 99999, p2["id"]]},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        assert [r["status"] for r in response.json()["results"]] == [200, 404, 200]
+        assert client.get("/products", headers=auth_headers).json()["items"] == []
+
+    def test_batch_size_is_capped(self, client, auth_headers, monkeypatch):
+        """Test oversized batches are rejected"""
+        monkeypatch.setattr("app.routes.MAX_BATCH_SIZE", 2)
+        items = [{"name": f"P{i}", "price": 1.0} for i in range(3)]
+        response = client.post("/products:batch", json=items, headers=auth_headers)
+        assert response.status_code == 413
+
+    def test_lookup_products_by_ids(self, client, auth_headers):
+        """Test batch lookup keeps request order and reports missing ids"""
+        ids = [
+            client.post(
+                "/products",
+                json={"name": f"Produit {i}", "price": 1.0},
+                headers=auth_headers,
+            ).json()["id"]
+            for i in range(3)
+        ]
+        # Warm the cache for one of them: it must not change the result
+        client.get(f"/products/{ids[1]}", headers=auth_headers)
+
+        requested = [ids[2], 99999, ids[0], ids[1], ids[2]]
+        response = client.get(
+            "/products",
+            params={"ids": ",".join(map(str, requested))},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [p["id"] for p in data["items"]] == [ids[2], ids[0], ids[1]]
+        assert data["missing_ids"] == [99999]
+
+        response = client.post(
+            "/products:lookup", json={"ids": requested}, headers=auth_headers
+        )
+        assert response.json() == data
+
+    def test_lookup_products_invalid_and_capped(
+        self, client, auth_headers, monkeypatch
+    ):
+        """Test batch lookup rejects malformed ids and oversized sets"""
+        response = client.get("/products", params={"ids": "1,a"}, headers=auth_headers)
+        assert response.status_code == 422
+
+        monkeypatch.setattr("app.routes.MAX_BATCH_IDS", 2)
+        response = client.post(
+            "/products:lookup", json={"ids": [1, 2, 3]}, headers=auth_headers
+        )
+        assert response.status_code == 413
+
+    def test_get_product_etag_not_modified(self, client, auth_headers, created_product):
+        """Test reads return a weak ETag and honour If-None-Match"""
+        url = f"/products/{created_product['id']}"
+        response = client.get(url, headers=auth_headers)
+        etag = response.headers["etag"]
+        assert etag == f'W/"{created_product["id"]}-1"'
+        assert response.json()["version"] == 1
+
+        response = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        client.post(f"{url}/stock", json={"delta": 1}, headers=auth_headers)
+        response = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["version"] == 2
+
+    def test_update_product_if_match(self, client, auth_headers, created_product):
+        """Test optimistic concurrency on PUT with If-Match"""
+        url = f"/products/{created_product['id']}"
+        etag = client.get(url, headers=auth_headers).headers["etag"]
+
+        response = client.put(
+            url, json={"name": "Premier"}, headers={**auth_headers, "If-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.json()["version"] == 2
+        assert response.headers["etag"] != etag
+
+        # A second writer holding the old ETag must not overwrite the change
+        response = client.put(
+            url, json={"name": "Second"}, headers={**auth_headers, "If-Match": etag}
+        )
+        assert response.status_code == 412
+        assert client.get(url, headers=auth_headers).json()["name"] == "Premier"
+
+        response = client.put(
+            "/products/99999",
+            json={"name": "Absent"},
+            headers={**auth_headers, "If-Match": etag},
+        )
+        assert response.status_code == 404
+
+    def test_delete_product_if_match(self, client, auth_headers, created_product):
+        """Test conditional DELETE with a stale then current ETag"""
+        url = f"/products/{created_product['id']}"
+        stale = client.get(url, headers=auth_headers).headers["etag"]
+        current = client.put(url, json={"stock": 1}, headers=auth_headers).headers[
+            "etag"
+        ]
+
+        response = client.delete(url, headers={**auth_headers, "If-Match": stale})
+        assert response.status_code == 412
+        response = client.delete(url, headers={**auth_headers, "If-Match": current})
+        assert response.status_code == 200
+
+    def test_change_stock(self, client, auth_headers, created_product):
+        """Test atomic stock increments and decrements"""
+        url = f"/products/{created_product['id']}/stock"
+
+        response = client.post(url, json={"delta": 3}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["stock"] == 8
+
+        response = client.post(url, json={"delta": -8}, headers=auth_headers)
+        assert response.json()["stock"] == 0
+
+        product = client.get(f"/products/{created_product['id']}", headers=auth_headers)
+        assert product.json()["stock"] == 0
+
+    def test_change_stock_never_below_zero(self, client, auth_headers, created_product):
+        """Test the guard rejects decrements below zero unless allowed"""
+        url = f"/products/{created_product['id']}/stock"
+
+        response = client.post(url, json={"delta": -6}, headers=auth_headers)
+        assert response.status_code == 409
+
+        response = client.post(
+            url, json={"delta": -6, "allow_negative": True}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["stock"] == -1
+
+    def test_change_stock_nonexistent_product(self, client, auth_headers):
+        """Test stock change on a missing product returns 404"""
+        response = client.post(
+            "/products/99999/stock", json={"delta": 1}, headers=auth_headers
+        )
+        assert response.status_code == 404
 
     def test_get_nonexistent_product(self, client, auth_headers):
         """Test getting non-existent product should return 404"""
@@ -0,0 +1,114 @@
+# tests/test_broker.py
+import asyncio
+import json
+from decimal import Decimal
+
+from app.messaging.broker import MessageBroker, encode_event
+
+
+class FakeExchange:
+    """Exchange en mémoire, éventuellement en échec"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.messages = []
+
+    async def publish(self, message, routing_key):
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("nack")
+        self.messages.append((routing_key, json.loads(message.body)))
+
+
+def connected_broker(*exchanges):
+    broker = MessageBroker("amqp://unused", "product-api")
+    broker.events_exchange = exchanges[0]
+    broker._publish_exchanges = list(exchanges)
+    return broker
+
+
+def test_encode_event_handles_decimal_and_unicode():
+    body = encode_event({"name": "Café", "price": Decimal("12.50")})
+    assert json.loads(body) == {"name": "Café", "price": 12.5}
+
+
+def test_publish_many_spreads_over_channel_pool():
+    first, second = FakeExchange(), FakeExchange()
+    broker = connected_broker(first, second)
+
+    errors = asyncio.run(
+        broker.publish_many(
+            {"event_type": "product.updated", "data": {"product_id": i}}
+            for i in range(4)
+        )
+    )
+
+    assert errors == [None] * 4
+    assert len(first.messages) == 2
+    assert len(second.messages) == 2
+    routing_key, body = first.messages[0]
+    assert routing_key == "product.updated"
+    assert body["service"] == "product-api"
+    assert body["data"] == {"product_id": 0}
+
+
+def test_ordered_batch_is_pinned_to_one_channel():
+    """RabbitMQ keeps order per channel only: an ordered batch uses one channel"""
+    first, second = FakeExchange(), FakeExchange()
+    broker = connected_broker(first, second)
+
+    for _ in range(2):
+        asyncio.run(
+            broker.publish_many(
+                (
+                    {"event_type": "product.updated", "data": {"product_id": i}}
+                    for i in range(4)
+                ),
+                ordered=True,
+            )
+        )
+
+    for exchange in (first, second):
+        assert [body["data"]["product_id"] for _, body in exchange.messages] == [
+            0,
+            1,
+            2,
+            3,
+        ]
+
+
+def test_publish_many_reports_failures_per_event():
+    broker = connected_broker(FakeExchange(), FakeExchange(fail=True))
+
+    errors = asyncio.run(
+        broker.publish_many(
+            [
+                {"event_type": "product.created", "data": {}, "event_id": "a"},
+                {"event_type": "product.created", "data": {}, "event_id": "b"},
+            ]
+        )
+    )
+
+    assert errors[0] is None
+    assert isinstance(errors[1], RuntimeError)
+    stats = broker.publish_stats()
+    assert stats["published"] == 1
+    assert stats["errors"] == 1
+    assert stats["latency_ms"]["p50"] is not None
+
+
+def test_reconnecting_robust_connection_is_not_connected():
+    """connect_robust keeps is_closed False while reconnecting"""
+
+    class Connection:
+        is_closed = False
+
+        def __init__(self):
+            self.connected = asyncio.Event()
+
+    broker = MessageBroker("amqp://unused", "product-api")
+    broker.connection = Connection()
+    assert not broker.is_connected
+
+    broker.connection.connected.set()
+    assert broker.is_connected
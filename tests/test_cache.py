@@ -0,0 +1,81 @@
+# tests/test_cache.py
+import asyncio
+
+from app.cache import TTLCache, invalidate_product, product_cache
+from app.routes import fetch_products
+
+
+def test_cache_hit_and_miss_counters():
+    cache = TTLCache(maxsize=10, ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_invalidate():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+
+
+class InvalidatingSession:
+    """Session whose query races with a write invalidating the product"""
+
+    def __init__(self, db, product_id):
+        self.db = db
+        self.product_id = product_id
+
+    async def scalars(self, stmt):
+        result = await self.db.scalars(stmt)
+        invalidate_product(self.product_id)
+        return result
+
+
+def test_read_racing_an_invalidation_is_not_cached(
+    async_session_factory, created_product
+):
+    product_id = created_product["id"]
+
+    async def run(racing):
+        async with async_session_factory() as db:
+            session = InvalidatingSession(db, product_id) if racing else db
+            return await fetch_products(session, [product_id])
+
+    assert product_id in asyncio.run(run(racing=True))
+    assert product_cache.get(product_id) is None
+
+    asyncio.run(run(racing=False))
+    assert product_cache.get(product_id) is not None
@@ -0,0 +1,158 @@
+# tests/test_catalog.py
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from sqlalchemy import event
+
+from app import catalog
+from app.catalog import catalog_snapshot
+from app.main import handle_product_events
+from app.messaging.events import PRODUCT_STOCK_RESERVED
+
+
+def create(client, auth_headers, name):
+    response = client.post(
+        "/products", json={"name": name, "price": 2.5}, headers=auth_headers
+    )
+    return response.json()["id"]
+
+
+def test_catalog_lists_products_with_etag(client, auth_headers):
+    first = create(client, auth_headers, "Arabica")
+    second = create(client, auth_headers, "Robusta")
+
+    response = client.get("/products/catalog", headers=auth_headers)
+    assert response.status_code == 200
+    assert [p["id"] for p in response.json()] == [first, second]
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_catalog_not_modified_without_database(
+    client, auth_headers, async_session_factory
+):
+    create(client, auth_headers, "Arabica")
+    etag = client.get("/products/catalog", headers=auth_headers).headers["etag"]
+
+    statements = []
+    engine = async_session_factory.kw["bind"].sync_engine
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+
+    response = client.get(
+        "/products/catalog", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert client.get("/products/catalog", headers=auth_headers).status_code == 200
+    assert statements == []
+
+
+def test_catalog_rebuilt_incrementally_after_writes(client, auth_headers):
+    kept = create(client, auth_headers, "Arabica")
+    removed = create(client, auth_headers, "Robusta")
+    etag = client.get("/products/catalog", headers=auth_headers).headers["etag"]
+    full_builds = catalog_snapshot.full_builds
+
+    client.put(f"/products/{kept}", json={"name": "Moka"}, headers=auth_headers)
+    client.delete(f"/products/{removed}", headers=auth_headers)
+
+    response = client.get(
+        "/products/catalog", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [p["name"] for p in response.json()] == ["Moka"]
+    assert catalog_snapshot.full_builds == full_builds
+    assert catalog_snapshot.incremental_builds >= 1
+
+
+def test_catalog_served_precompressed(client, auth_headers):
+    create(client, auth_headers, "Arabica")
+
+    response = client.get(
+        "/products/catalog", headers={**auth_headers, "Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()[0]["name"] == "Arabica"
+
+    response = client.get(
+        "/products/catalog", headers={**auth_headers, "Accept-Encoding": "br, gzip"}
+    )
+    assert response.headers["content-encoding"] == "br"
+    assert response.json()[0]["name"] == "Arabica"
+
+    response = client.get(
+        "/products/catalog", headers={**auth_headers, "Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in response.headers
+    assert response.json()[0]["name"] == "Arabica"
+
+
+def test_catalog_encoded_off_the_event_loop(client, auth_headers, monkeypatch):
+    """Assembly and compression run in a worker thread, not on the event loop"""
+    on_loop = []
+    encode = catalog._encode
+
+    def recording_encode(fragments):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return encode(fragments)
+
+    monkeypatch.setattr(catalog, "_encode", recording_encode)
+    create(client, auth_headers, "Arabica")
+
+    response = client.get("/products/catalog", headers=auth_headers)
+    assert response.json()[0]["name"] == "Arabica"
+    assert on_loop and not any(on_loop)
+
+
+class ProductEventMessage:
+    """Minimal aio-pika message for handle_product_events"""
+
+    message_id = "evt-1"
+
+    def __init__(self, event_type, data):
+        self.body = json.dumps({"event_type": event_type, "data": data}).encode()
+
+    @asynccontextmanager
+    async def process(self):
+        yield
+
+
+def test_reservation_event_rebuilds_catalog_incrementally(client, auth_headers):
+    product_id = create(client, auth_headers, "Arabica")
+    client.get("/products/catalog", headers=auth_headers)
+    full_builds = catalog_snapshot.full_builds
+
+    message = ProductEventMessage(
+        PRODUCT_STOCK_RESERVED,
+        {"order_id": "A1", "lines": [{"product_id": product_id, "quantity": 1}]},
+    )
+    asyncio.run(handle_product_events(message))
+    assert catalog_snapshot.stats()["dirty"] == 1
+
+    client.get("/products/catalog", headers=auth_headers)
+    assert catalog_snapshot.full_builds == full_builds
+
+
+def test_batch_creation_rebuilds_catalog_incrementally(client, auth_headers):
+    create(client, auth_headers, "Arabica")
+    client.get("/products/catalog", headers=auth_headers)
+    full_builds = catalog_snapshot.full_builds
+
+    client.post(
+        "/products:batch",
+        json=[{"name": "Moka", "price": 1.0}, {"name": "Robusta", "price": 2.0}],
+        headers=auth_headers,
+    )
+    response = client.get("/products/catalog", headers=auth_headers)
+    assert [p["name"] for p in response.json()] == ["Arabica", "Moka", "Robusta"]
+    assert catalog_snapshot.full_builds == full_builds
@@ -0,0 +1,85 @@
+# tests/test_changes.py
+from datetime import timedelta
+
+import pytest
+
+from app.inventory import reserve_order_stock
+from tests.test_inventory import add_products, run_in_transaction
+
+
+@pytest.fixture(autouse=True)
+def no_settle_window(monkeypatch):
+    monkeypatch.setattr("app.routes.CHANGE_FEED_SETTLE", timedelta(0))
+
+
+def create(client, auth_headers, name):
+    response = client.post(
+        "/products", json={"name": name, "price": 3.0}, headers=auth_headers
+    )
+    return response.json()["id"]
+
+
+def changes(client, auth_headers, **params):
+    response = client.get("/products/changes", params=params, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_feed_keeps_latest_change_per_product(client, auth_headers):
+    kept, updated, deleted = (create(client, auth_headers, n) for n in "ABC")
+    client.put(f"/products/{updated}", json={"stock": 4}, headers=auth_headers)
+    client.delete(f"/products/{deleted}", headers=auth_headers)
+
+    page = changes(client, auth_headers, since=0)
+    assert [(c["product_id"], c["op"]) for c in page["changes"]] == [
+        (kept, "upsert"),
+        (updated, "upsert"),
+        (deleted, "delete"),
+    ]
+    assert page["changes"][1]["product"]["stock"] == 4
+    assert page["changes"][2]["product"] is None
+    assert page["has_more"] is False
+
+
+def test_feed_resumes_from_cursor_in_pages(client, auth_headers):
+    ids = [create(client, auth_headers, f"P{i}") for i in range(3)]
+
+    first = changes(client, auth_headers, since=0, limit=2)
+    assert first["has_more"] is True
+    second = changes(client, auth_headers, since=first["next_cursor"], limit=2)
+    assert [c["product_id"] for c in first["changes"] + second["changes"]] == ids
+    assert second["has_more"] is False
+
+    # Only what changed after the cursor comes back
+    client.put(f"/products/{ids[0]}", json={"name": "Nouveau"}, headers=auth_headers)
+    third = changes(client, auth_headers, since=second["next_cursor"])
+    assert [c["product_id"] for c in third["changes"]] == [ids[0]]
+    empty = changes(client, auth_headers, since=third["next_cursor"])
+    assert empty == {
+        "changes": [],
+        "next_cursor": third["next_cursor"],
+        "has_more": False,
+    }
+
+
+def test_settle_window_hides_fresh_changes(client, auth_headers, monkeypatch):
+    create(client, auth_headers, "A")
+    monkeypatch.setattr("app.routes.CHANGE_FEED_SETTLE", timedelta(minutes=1))
+    assert changes(client, auth_headers, since=0)["changes"] == []
+
+
+def test_reservations_feed_the_log(
+    client, auth_headers, db_session, async_session_factory
+):
+    p1, p2 = add_products(db_session, 5, 1)
+
+    async def reserve_two_orders(db):
+        await reserve_order_stock(db, "order-1", {p1: 2})
+        # Failing order: its savepoint rollback must not drop order-1's change
+        await reserve_order_stock(db, "order-2", {p2: 5})
+
+    run_in_transaction(async_session_factory, reserve_two_orders)
+
+    page = changes(client, auth_headers, since=0)
+    assert [c["product_id"] for c in page["changes"]] == [p1]
+    assert page["changes"][0]["product"]["stock"] == 3
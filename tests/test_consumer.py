@@ -0,0 +1,165 @@
+# tests/test_consumer.py
+import asyncio
+import json
+
+from app.messaging.consumer import EventConsumer, _AckTracker
+from app.messaging.dedupe import EventDeduplicator
+
+
+class FakeMessage:
+    """Message AMQP minimal : enregistre les ack/reject reçus"""
+
+    channel = "channel-1"
+
+    def __init__(self, tag, event_type, event_id=None, body=None):
+        self.delivery_tag = tag
+        self.message_id = event_id or f"evt-{tag}"
+        self.body = (
+            body
+            or json.dumps(
+                {"event_type": event_type, "event_id": self.message_id, "data": {}}
+            ).encode()
+        )
+        self.acks = []
+        self.rejected = False
+
+    async def ack(self, multiple=False):
+        self.acks.append(multiple)
+
+    async def reject(self, requeue=False):
+        self.rejected = True
+
+
+def run_consumer(consumer, messages):
+    async def run():
+        consumer.start()
+        for message in messages:
+            await consumer.on_message(message)
+        await asyncio.sleep(consumer.batch_window * 2)
+        await consumer.stop()
+
+    asyncio.run(run())
+
+
+def test_messages_are_batched_by_type_with_one_multi_ack():
+    calls = []
+
+    async def handler(events):
+        calls.append([e["event_id"] for e in events])
+
+    consumer = EventConsumer(workers=2, batch_size=10, batch_window=0.01)
+    consumer.register("order.created", handler)
+    messages = [FakeMessage(tag, "order.created") for tag in range(1, 5)]
+
+    run_consumer(consumer, messages)
+
+    assert calls == [["evt-1", "evt-2", "evt-3", "evt-4"]]
+    assert [m.acks for m in messages] == [[], [], [], [True]]
+    assert consumer.stats()["processed"] == 4
+    assert consumer.stats()["in_flight"] == 0
+
+
+def test_lane_keeps_order_across_event_types():
+    """order.created and order.cancelled share one lane, committed in arrival order"""
+    done = []
+
+    async def created(events):
+        await asyncio.sleep(0.02)
+        done.append(("created", [e["event_id"] for e in events]))
+
+    async def cancelled(events):
+        done.append(("cancelled", [e["event_id"] for e in events]))
+
+    consumer = EventConsumer(workers=4, batch_size=2, batch_window=0.01)
+    consumer.register("order.created", created, lane="order")
+    consumer.register("order.cancelled", cancelled, lane="order")
+    messages = [
+        FakeMessage(1, "order.created"),
+        FakeMessage(2, "order.created"),
+        FakeMessage(3, "order.cancelled"),
+        FakeMessage(4, "order.created"),
+    ]
+
+    run_consumer(consumer, messages)
+
+    assert done == [
+        ("created", ["evt-1", "evt-2"]),
+        ("cancelled", ["evt-3"]),
+        ("created", ["evt-4"]),
+    ]
+    assert consumer.stats()["processed"] == 4
+    assert consumer.stats()["in_flight"] == 0
+
+
+def test_batch_size_triggers_dispatch():
+    calls = []
+
+    async def handler(events):
+        calls.append(len(events))
+
+    consumer = EventConsumer(workers=1, batch_size=2, batch_window=0.01)
+    consumer.register("order.created", handler)
+
+    run_consumer(consumer, [FakeMessage(t, "order.created") for t in range(1, 6)])
+
+    assert calls == [2, 2, 1]
+
+
+def test_failing_event_is_isolated_and_rejected():
+    async def handler(events):
+        if any(e["event_id"] == "evt-2" for e in events):
+            raise RuntimeError("boom")
+
+    consumer = EventConsumer(workers=1, batch_size=10, batch_window=0.01)
+    consumer.register("order.created", handler)
+    messages = [FakeMessage(tag, "order.created") for tag in range(1, 4)]
+
+    run_consumer(consumer, messages)
+
+    assert messages[1].rejected
+    assert not messages[0].rejected and not messages[2].rejected
+    # Le dernier ack groupé couvre les messages 1 et 3, jamais le message rejeté
+    assert messages[2].acks == [True]
+    assert consumer.stats()["failed"] == 1
+    assert consumer.stats()["processed"] == 2
+
+
+def test_unhandled_types_and_duplicates_are_acked():
+    deduplicator = EventDeduplicator()
+    deduplicator.remember("evt-dup")
+    consumer = EventConsumer(batch_window=0.01, deduplicator=deduplicator)
+    messages = [
+        FakeMessage(1, "customer.updated"),
+        FakeMessage(2, "order.created", event_id="evt-dup"),
+        FakeMessage(3, "order.created", body=b"not json"),
+    ]
+
+    run_consumer(consumer, messages)
+
+    stats = consumer.stats()
+    assert stats["ignored"] == 1
+    assert stats["duplicates"] == 1
+    assert stats["in_flight"] == 0
+    assert any(m.acks for m in messages)
+
+
+def test_ack_tracker_never_covers_pending_messages():
+    async def run():
+        tracker = _AckTracker()
+        messages = [FakeMessage(tag, "x") for tag in range(1, 4)]
+        for message in messages:
+            tracker.add(message)
+
+        tracker.settle(messages[2], needs_ack=True)
+        assert await tracker.flush() == 0
+        assert messages[2].acks == []
+
+        tracker.settle(messages[0], needs_ack=True)
+        assert await tracker.flush() == 1
+        assert messages[0].acks == [True]
+
+        tracker.settle(messages[1], needs_ack=True)
+        assert await tracker.flush() == 2
+        assert messages[2].acks == [True]
+
+    asyncio.run(run())
@@ -1,7 +1,18 @@
 # tests/test_database.py
+import asyncio
+import os
+
+import pytest
 from sqlalchemy import text
-from sqlalchemy.exc import SQLAlchemyError
-from app.db import engine
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import db
+from app.cache import page_cache, product_cache
+from app.db import engine, get_read_session_factory, to_async_url
+from app.main import app
+from app.pool import MonitoredQueuePool, PoolMonitor, watch
+from app.schemas import Product, ProductFilters
 
 
 def test_connection_to_database():
@@ -11,3 +22,115 @@ def test_connection_to_database():
             assert result.fetchone()[0] == 1
     except SQLAlchemyError as e:
         assert False, f"Database connection failed: {e}"
+
+
+def test_pool_monitor_records_waits_and_timeouts():
+    """Checkout waits, timeouts and saturation are tracked per pool"""
+    monitor = PoolMonitor("test")
+    async_engine = create_async_engine(
+        to_async_url(os.getenv("DATABASE_URL")),
+        poolclass=MonitoredQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.2,
+    )
+    watch(async_engine.sync_engine.pool, monitor)
+
+    async def scenario():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert monitor.stats()["saturation"] == 1.0
+            with pytest.raises(TimeoutError):
+                async with async_engine.connect():
+                    pass
+        await async_engine.dispose()
+
+    asyncio.run(scenario())
+    stats = monitor.stats()
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["wait_ms"]["max"] >= 200
+    # dispose() recrée le pool : le moniteur suit le nouveau
+    assert stats["checked_out"] == 0
+
+
+class CountingFactory:
+    def __init__(self, factory):
+        self.factory = factory
+        self.sessions = 0
+
+    def __call__(self):
+        self.sessions += 1
+        return self.factory()
+
+
+def test_reads_go_to_replica_except_after_write(
+    client, auth_headers, async_session_factory, monkeypatch
+):
+    """Reads use the replica, a client that just wrote reads from the primary"""
+    primary = CountingFactory(async_session_factory)
+    replica = CountingFactory(async_session_factory)
+    monkeypatch.setattr(db, "AsyncSessionLocal", primary)
+    monkeypatch.setattr(db, "AsyncReadSessionLocal", replica)
+    del app.dependency_overrides[get_read_session_factory]
+
+    client.get("/products", headers=auth_headers)
+    assert (primary.sessions, replica.sessions) == (0, 1)
+
+    response = client.post(
+        "/products", json={"name": "Écrit", "price": 1.0}, headers=auth_headers
+    )
+    assert db.READ_YOUR_WRITES_COOKIE in response.cookies
+
+    response = client.get("/products", headers=auth_headers)
+    assert response.json()["items"][0]["name"] == "Écrit"
+    assert (primary.sessions, replica.sessions) == (1, 1)
+
+    client.cookies.clear()
+    client.get("/products?cursor=1", headers=auth_headers)
+    assert (primary.sessions, replica.sessions) == (1, 2)
+
+
+def test_recent_writer_bypasses_caches_filled_from_replica(
+    client, auth_headers, async_session_factory, monkeypatch
+):
+    """After a write, replica reads are not cached and the writer skips the caches"""
+    primary = CountingFactory(async_session_factory)
+    replica = CountingFactory(async_session_factory)
+    monkeypatch.setattr(db, "AsyncSessionLocal", primary)
+    monkeypatch.setattr(db, "AsyncReadSessionLocal", replica)
+    del app.dependency_overrides[get_read_session_factory]
+
+    product_id = client.post(
+        "/products", json={"name": "Avant", "price": 1.0}, headers=auth_headers
+    ).json()["id"]
+    client.cookies.clear()
+
+    # Lecture du réplica dans la fenêtre read-your-writes : pas de mise en cache
+    client.get(f"/products/{product_id}", headers=auth_headers)
+    client.get("/products", headers=auth_headers)
+    assert product_cache.get(product_id) is None
+    assert page_cache.stats()["size"] == 0
+
+    # Un produit en cache (éventuellement périmé) n'est pas servi à qui vient d'écrire
+    client.put(
+        f"/products/{product_id}",
+        json={"name": "Après", "price": 1.0},
+        headers=auth_headers,
+    )
+    stale = client.get(f"/products/{product_id}", headers=auth_headers).json()
+    product_cache.set(product_id, Product(**{**stale, "name": "Avant"}))
+    page_cache.set((None, 50, ProductFilters()), b'{"items": []}')
+
+    response = client.get(f"/products/{product_id}", headers=auth_headers)
+    assert response.json()["name"] == "Après"
+    assert client.get("/products", headers=auth_headers).json()["items"]
+    assert replica.sessions == 2
+
+
+def test_db_health_reports_pools(client, auth_headers):
+    """Test pool statistics endpoint"""
+    data = client.get("/health/db", headers=auth_headers).json()
+    assert data["replica"] is False
+    assert data["pools"]["replica"] is None
+    assert data["pools"]["primary"]["size"] == db.DB_POOL_SIZE
@@ -0,0 +1,60 @@
+# tests/test_dedupe.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.messaging.dedupe import EventDeduplicator
+from app.models import ProcessedEventModel
+
+
+def claim(session_factory, deduplicator, event_id):
+    async def run():
+        async with session_factory() as db:
+            async with db.begin():
+                return await deduplicator.claim(db, event_id, "order.created")
+
+    return asyncio.run(run())
+
+
+def test_claim_once_per_event_id(db_engine, async_session_factory):
+    deduplicator = EventDeduplicator()
+
+    assert claim(async_session_factory, deduplicator, "evt-1") is True
+    assert claim(async_session_factory, deduplicator, "evt-1") is False
+    assert claim(async_session_factory, deduplicator, "evt-2") is True
+    assert deduplicator.stats()["duplicates"] == 1
+
+
+def test_duplicate_claim_is_remembered_in_memory(db_engine, async_session_factory):
+    first, second = EventDeduplicator(), EventDeduplicator()
+    claim(async_session_factory, first, "evt-1")
+
+    # Un autre réplica découvre le doublon en base, puis l'écarte en mémoire
+    assert second.seen("evt-1") is False
+    assert claim(async_session_factory, second, "evt-1") is False
+    assert second.seen("evt-1") is True
+
+
+def test_events_without_id_are_not_deduplicated(db_engine, async_session_factory):
+    deduplicator = EventDeduplicator()
+    assert claim(async_session_factory, deduplicator, None) is True
+    assert claim(async_session_factory, deduplicator, None) is True
+    assert deduplicator.seen(None) is False
+
+
+def test_prune_removes_expired_ids(db_session, async_session_factory):
+    old = datetime.now(timezone.utc) - timedelta(days=30)
+    db_session.add_all(
+        [
+            ProcessedEventModel(event_id="old", event_type="x", processed_at=old),
+            ProcessedEventModel(event_id="new", event_type="x"),
+        ]
+    )
+    db_session.commit()
+
+    deleted = asyncio.run(EventDeduplicator().prune(async_session_factory))
+
+    assert deleted == 1
+    db_session.expire_all()
+    assert db_session.scalars(select(ProcessedEventModel.event_id)).all() == ["new"]
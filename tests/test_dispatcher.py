@@ -0,0 +1,138 @@
+# tests/test_dispatcher.py
+import asyncio
+import time
+
+from sqlalchemy import select
+
+from app.models import OutboxEventModel
+from app.messaging.dispatcher import EventDispatcher, OVERFLOW_BLOCK
+from app.messaging.outbox import add_outbox_event, committed_outbox_events
+from app.messaging.events import PRODUCT_CREATED, PRODUCT_DELETED
+from tests.test_outbox import FakeBroker, outbox_rows
+
+
+def run_dispatcher(session_factory, dispatcher, stop=True):
+    """Dispatch every outbox row through a started dispatcher"""
+
+    async def run():
+        async with session_factory() as db:
+            events = (
+                await db.scalars(select(OutboxEventModel).order_by(OutboxEventModel.id))
+            ).all()
+        dispatcher.start()
+        await dispatcher.dispatch(events)
+        if stop:
+            await dispatcher.stop()
+
+    asyncio.run(run())
+
+
+def test_dispatcher_publishes_and_marks_sent(
+    client, auth_headers, db_session, async_session_factory, created_product
+):
+    client.delete(f"/products/{created_product['id']}", headers=auth_headers)
+    broker = FakeBroker()
+    dispatcher = EventDispatcher(broker, async_session_factory)
+
+    run_dispatcher(async_session_factory, dispatcher)
+
+    assert [p[0] for p in broker.published] == [PRODUCT_CREATED, PRODUCT_DELETED]
+    assert all(row.published_at is not None for row in outbox_rows(db_session))
+    stats = dispatcher.stats()
+    assert stats["enqueued"] == 2
+    assert stats["published"] == 2
+    assert stats["depth"] == 0
+    assert stats["enqueue_to_publish_ms"]["p50"] is not None
+
+
+def test_dispatcher_drops_on_overflow(
+    client, auth_headers, db_session, async_session_factory, created_product
+):
+    client.delete(f"/products/{created_product['id']}", headers=auth_headers)
+    broker = FakeBroker()
+    dispatcher = EventDispatcher(broker, async_session_factory, maxsize=1)
+
+    run_dispatcher(async_session_factory, dispatcher)
+
+    # The dropped event stays pending for the outbox relay
+    assert dispatcher.stats()["dropped"] == 1
+    assert len(broker.published) == 1
+    pending = [row for row in outbox_rows(db_session) if row.published_at is None]
+    assert len(pending) == 1
+
+
+def test_dispatcher_blocks_on_overflow(
+    client, auth_headers, db_session, async_session_factory, created_product
+):
+    client.delete(f"/products/{created_product['id']}", headers=auth_headers)
+    broker = FakeBroker()
+    dispatcher = EventDispatcher(
+        broker, async_session_factory, maxsize=1, overflow=OVERFLOW_BLOCK
+    )
+
+    run_dispatcher(async_session_factory, dispatcher)
+
+    assert dispatcher.stats()["dropped"] == 0
+    assert len(broker.published) == 2
+
+
+def test_block_timeout_bounds_the_whole_dispatch_call():
+    """A full queue stalls one dispatch() for block_timeout, not per event"""
+    dispatcher = EventDispatcher(
+        FakeBroker(), None, maxsize=1, overflow=OVERFLOW_BLOCK, block_timeout=0.05
+    )
+
+    async def run():
+        # No publishers: the queue stays full after the first event
+        dispatcher._queue = asyncio.Queue(maxsize=dispatcher.maxsize)
+        started = time.perf_counter()
+        await dispatcher.dispatch([object() for _ in range(100)])
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 0.5
+    stats = dispatcher.stats()
+    assert stats["enqueued"] == 1
+    assert stats["dropped"] == 99
+
+
+def test_dispatcher_leaves_rows_pending_without_broker(
+    client, db_session, async_session_factory, created_product
+):
+    broker = FakeBroker()
+    broker.is_connected = False
+    dispatcher = EventDispatcher(broker, async_session_factory)
+
+    run_dispatcher(async_session_factory, dispatcher)
+
+    assert dispatcher.stats()["failed"] == 1
+    assert outbox_rows(db_session)[0].published_at is None
+
+
+def test_dispatch_after_stop_is_dropped(
+    client, db_session, async_session_factory, created_product
+):
+    dispatcher = EventDispatcher(FakeBroker(), async_session_factory)
+
+    async def run():
+        dispatcher.start()
+        await dispatcher.stop()
+        async with async_session_factory() as db:
+            events = (await db.scalars(select(OutboxEventModel))).all()
+        await dispatcher.dispatch(events)
+
+    asyncio.run(run())
+    assert dispatcher.stats()["dropped"] == 1
+
+
+def test_committed_outbox_events_are_tracked_per_session(
+    db_engine, async_session_factory
+):
+    async def run():
+        async with async_session_factory() as db:
+            event = add_outbox_event(db, PRODUCT_CREATED, {"product_id": 1})
+            await db.commit()
+            assert committed_outbox_events(db) == [event]
+            assert committed_outbox_events(db) == []
+            return event.id
+
+    assert asyncio.run(run()) is not None
@@ -0,0 +1,156 @@
+# tests/test_inventory.py
+import asyncio
+
+from sqlalchemy import select
+
+from app import main
+from app.inventory import order_lines, reserve_order_stock, release_order_stock
+from app.models import OutboxEventModel, ProductModel
+from app.messaging.events import (
+    ORDER_CANCELLED,
+    ORDER_CREATED,
+    PRODUCT_STOCK_RESERVED,
+    PRODUCT_STOCK_RESERVATION_FAILED,
+    PRODUCT_STOCK_RELEASED,
+)
+
+
+def run_in_transaction(session_factory, operation, *args):
+    async def run():
+        async with session_factory() as db:
+            async with db.begin():
+                return await operation(db, *args)
+
+    return asyncio.run(run())
+
+
+def add_products(db_session, *stocks):
+    products = [
+        ProductModel(name=f"P{i}", price=1, stock=s) for i, s in enumerate(stocks)
+    ]
+    db_session.add_all(products)
+    db_session.commit()
+    return [p.id for p in products]
+
+
+def stocks(db_session, ids):
+    db_session.expire_all()
+    return [db_session.get(ProductModel, pid).stock for pid in ids]
+
+
+def event_types(db_session):
+    return db_session.scalars(
+        select(OutboxEventModel.event_type).order_by(OutboxEventModel.id)
+    ).all()
+
+
+def test_order_lines_merges_duplicates():
+    order = {
+        "products": [
+            {"product_id": 1, "quantity": 2},
+            {"product_id": "1", "quantity": 3},
+            {"product_id": 2},
+            {"product_id": 3, "quantity": 0},
+        ]
+    }
+    assert order_lines(order) == {1: 5, 2: 1}
+    assert order_lines({}) == {}
+
+
+def test_reserve_all_lines(db_session, async_session_factory):
+    p1, p2 = add_products(db_session, 10, 3)
+
+    result = run_in_transaction(
+        async_session_factory, reserve_order_stock, "A1", {p1: 4, p2: 3}
+    )
+
+    assert result is True
+    assert stocks(db_session, [p1, p2]) == [6, 0]
+    assert event_types(db_session) == [PRODUCT_STOCK_RESERVED]
+
+
+def test_reserve_is_all_or_nothing(db_session, async_session_factory):
+    p1, p2 = add_products(db_session, 10, 1)
+
+    result = run_in_transaction(
+        async_session_factory, reserve_order_stock, "A2", {p1: 4, p2: 2, 99999: 1}
+    )
+
+    assert result is False
+    assert stocks(db_session, [p1, p2]) == [10, 1]
+    failed = db_session.scalars(select(OutboxEventModel)).one()
+    assert failed.event_type == PRODUCT_STOCK_RESERVATION_FAILED
+    assert failed.payload["failed_product_ids"] == [p2, 99999]
+
+
+def test_reserve_twice_is_ignored(db_session, async_session_factory):
+    (p1,) = add_products(db_session, 10)
+
+    run_in_transaction(async_session_factory, reserve_order_stock, "A3", {p1: 4})
+    again = run_in_transaction(
+        async_session_factory, reserve_order_stock, "A3", {p1: 4}
+    )
+
+    assert again is None
+    assert stocks(db_session, [p1]) == [6]
+
+
+def test_order_without_id_is_not_reserved(db_session, async_session_factory):
+    (p1,) = add_products(db_session, 10)
+
+    result = run_in_transaction(
+        async_session_factory, reserve_order_stock, None, {p1: 4}
+    )
+    released = run_in_transaction(async_session_factory, release_order_stock, None)
+
+    assert result is None and released is None
+    assert stocks(db_session, [p1]) == [10]
+    assert event_types(db_session) == []
+
+
+def test_release_cancelled_order(db_session, async_session_factory):
+    p1, p2 = add_products(db_session, 10, 5)
+    run_in_transaction(async_session_factory, reserve_order_stock, 42, {p1: 4, p2: 5})
+
+    released = run_in_transaction(async_session_factory, release_order_stock, 42)
+    assert released == {p1: 4, p2: 5}
+    assert stocks(db_session, [p1, p2]) == [10, 5]
+
+    assert run_in_transaction(async_session_factory, release_order_stock, 42) is None
+    assert event_types(db_session) == [PRODUCT_STOCK_RESERVED, PRODUCT_STOCK_RELEASED]
+
+
+def order_created(event_id, order_id, *product_ids):
+    return {
+        "event_id": event_id,
+        "event_type": ORDER_CREATED,
+        "data": {
+            "order_data": {
+                "order_id": order_id,
+                "products": [{"product_id": pid, "quantity": 1} for pid in product_ids],
+            }
+        },
+    }
+
+
+def test_concurrent_order_batches_lock_products_together(
+    db_session, async_session_factory, monkeypatch
+):
+    """Batches touching the same products in opposite orders do not deadlock"""
+    p1, p2 = add_products(db_session, 10, 10)
+    monkeypatch.setattr(main, "AsyncSessionLocal", async_session_factory)
+    first = [order_created("e1", "A", p2), order_created("e2", "B", p1)]
+    second = [order_created("e3", "C", p1), order_created("e4", "D", p2)]
+    cancelled = [
+        {"event_id": f"e{i}", "event_type": ORDER_CANCELLED, "data": {"order_id": o}}
+        for i, o in ((5, "A"), (6, "C"))
+    ]
+
+    async def run():
+        await asyncio.gather(
+            main.handle_orders_created(first), main.handle_orders_created(second)
+        )
+        await main.handle_orders_cancelled(cancelled)
+
+    asyncio.run(run())
+    assert stocks(db_session, [p1, p2]) == [9, 9]
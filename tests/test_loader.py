@@ -0,0 +1,148 @@
+# tests/test_loader.py
+import asyncio
+
+from app.loader import BatchLoader
+from app.routes import _load_products
+
+
+class FakeFetch:
+    """Records each batch of keys and returns key * 10"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, session_factory, keys):
+        self.calls.append(sorted(keys))
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("database down")
+        return {key: key * 10 for key in keys if key != 404}
+
+
+def gather_loads(loader, keys, session_factory="db"):
+    async def run():
+        return await asyncio.gather(
+            *(loader.load(key, session_factory) for key in keys),
+            return_exceptions=True,
+        )
+
+    return asyncio.run(run())
+
+
+def test_concurrent_reads_share_one_fetch():
+    fetch = FakeFetch()
+    loader = BatchLoader(fetch)
+
+    assert gather_loads(loader, [1] * 50) == [10] * 50
+    assert fetch.calls == [[1]]
+    stats = loader.stats()
+    assert stats["coalesced"] == 49
+    assert stats["coalescing_ratio"] == 50.0
+    assert stats["in_flight"] == 0
+
+
+def test_distinct_keys_are_batched():
+    fetch = FakeFetch()
+    loader = BatchLoader(fetch)
+
+    assert gather_loads(loader, [3, 1, 2, 404, 1]) == [30, 10, 20, None, 10]
+    assert fetch.calls == [[1, 2, 3, 404]]
+
+
+def test_max_batch_splits_fetches():
+    fetch = FakeFetch()
+    loader = BatchLoader(fetch, max_batch=2)
+
+    gather_loads(loader, [1, 2, 3, 4, 5])
+    assert fetch.calls == [[1, 2], [3, 4], [5]]
+
+
+def test_fetch_error_reaches_every_waiter():
+    loader = BatchLoader(FakeFetch(fail=True))
+
+    results = gather_loads(loader, [1, 1, 2])
+    assert all(isinstance(r, RuntimeError) for r in results)
+    # Nothing is left in flight: the next read retries
+    assert loader.stats()["in_flight"] == 0
+
+
+def test_product_loader_uses_one_query(client, auth_headers, async_session_factory):
+    ids = [
+        client.post(
+            "/products", json={"name": f"P{i}", "price": 1.0}, headers=auth_headers
+        ).json()["id"]
+        for i in range(3)
+    ]
+    fetch = FakeFetch()
+
+    async def counting_fetch(session_factory, keys):
+        fetch.calls.append(sorted(keys))
+        return await _load_products(session_factory, keys)
+
+    loader = BatchLoader(counting_fetch)
+    products = gather_loads(loader, ids * 10 + [99999], async_session_factory)
+
+    assert [p.id for p in products[:3]] == ids
+    assert products[-1] is None
+    assert fetch.calls == [sorted(ids + [99999])]
+
+
+def test_batch_tasks_are_referenced_until_done():
+    fetch = FakeFetch()
+    loader = BatchLoader(fetch)
+
+    async def run():
+        pending = asyncio.ensure_future(loader.load(1, "db"))
+        await asyncio.sleep(loader.window * 2 + 0.001)
+        in_flight = len(loader._tasks)
+        await pending
+        await asyncio.sleep(0)
+        return in_flight, len(loader._tasks)
+
+    assert asyncio.run(run()) == (1, 0)
+
+
+def test_in_flight_loads_are_not_shared_across_session_factories():
+    fetch = FakeFetch()
+    loader = BatchLoader(fetch)
+
+    async def run():
+        return await asyncio.gather(
+            loader.load(1, "replica"), loader.load(1, "primary")
+        )
+
+    assert asyncio.run(run()) == [10, 10]
+    assert fetch.calls == [[1], [1]]
+    assert loader.stats()["coalesced"] == 0
+
+
+def test_forget_starts_a_new_load_for_later_callers():
+    fetch = FakeFetch()
+    loader = BatchLoader(fetch)
+
+    async def run():
+        before = asyncio.ensure_future(loader.load(1, "db"))
+        # Batch flushed and fetch running when the write invalidates key 1
+        await asyncio.sleep(loader.window * 2 + 0.001)
+        loader.forget(1)
+        after = await loader.load(1, "db")
+        return await before, after
+
+    assert asyncio.run(run()) == (10, 10)
+    assert fetch.calls == [[1], [1]]
+    assert loader.stats()["coalesced"] == 0
+
+
+def test_forget_keeps_keys_still_waiting_for_their_batch():
+    fetch = FakeFetch()
+    loader = BatchLoader(fetch)
+
+    async def run():
+        first = asyncio.ensure_future(loader.load(1, "db"))
+        await asyncio.sleep(0)
+        loader.forget()
+        return await asyncio.gather(first, loader.load(1, "db"))
+
+    assert asyncio.run(run()) == [10, 10]
+    assert fetch.calls == [[1]]
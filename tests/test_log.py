@@ -0,0 +1,79 @@
+# tests/test_log.py
+import io
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from app.log import (
+    CorrelationFilter,
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    SamplingFilter,
+    correlation,
+    parse_sample_rates,
+)
+
+
+def make_pipeline(rates=None, maxsize=0):
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=maxsize))
+    handler.addFilter(SamplingFilter(rates or {}))
+    handler.addFilter(CorrelationFilter())
+    logger = logging.getLogger(f"test.log.{id(stream)}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    return logger, handler, output, stream
+
+
+def read_lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_json_lines_carry_fields_and_correlation_id():
+    """Records are written as JSON by the listener thread, with extra fields"""
+    logger, handler, output, stream = make_pipeline()
+    listener = QueueListener(handler.queue, output)
+    listener.start()
+    with correlation("evt-1"):
+        logger.info("Published event %s", "product.created", extra={"latency_ms": 1.5})
+    logger.error("Failure")
+    listener.stop()
+
+    first, second = read_lines(stream)
+    assert first["message"] == "Published event product.created"
+    assert first["level"] == "INFO"
+    assert first["correlation_id"] == "evt-1"
+    assert first["latency_ms"] == 1.5
+    assert first["timestamp"].endswith("Z")
+    assert "correlation_id" not in second
+
+
+def test_sampling_keeps_warnings():
+    """A sampled key at rate 0 drops info records but never warnings"""
+    logger, handler, _, _ = make_pipeline(parse_sample_rates("broker.published=0"))
+    logger.info("Published", extra={"sample": "broker.published"})
+    logger.info("Not sampled")
+    logger.warning("Publish failed", extra={"sample": "broker.published"})
+    messages = [handler.queue.get_nowait().getMessage() for _ in range(2)]
+    assert messages == ["Not sampled", "Publish failed"]
+    assert handler.queue.empty()
+
+
+def test_full_queue_drops_without_blocking():
+    """The handler never waits: records beyond the queue size are counted"""
+    logger, handler, _, _ = make_pipeline(maxsize=1)
+    logger.info("kept")
+    logger.info("dropped")
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+
+def test_request_id_header(client):
+    """X-Request-ID is echoed back, or generated when absent"""
+    response = client.get("/", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["x-request-id"] == "abc-123"
+    assert len(client.get("/").headers["x-request-id"]) == 32
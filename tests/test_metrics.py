@@ -0,0 +1,53 @@
+# tests/test_metrics.py
+from app.metrics import Counter, Histogram, Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    """Observations land in the first bucket whose bound is >= value"""
+    registry = Registry()
+    histogram = registry.register(
+        Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    )
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+
+    text = registry.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/a"} 4' in text
+    assert 'latency_seconds_sum{route="/a"} 3.65' in text
+
+
+def test_counter_labels_are_escaped():
+    """Label values are escaped per the Prometheus text format"""
+    registry = Registry()
+    counter = registry.register(Counter("events_total", "Events", ("type",)))
+    counter.inc('a"b')
+    counter.inc('a"b', amount=2)
+    assert 'events_total{type="a\\"b"} 3' in registry.render()
+
+
+def test_metrics_endpoint(client, auth_headers, created_product):
+    """HTTP, SQL and cache metrics are exported in Prometheus text format"""
+    client.get(f"/products/{created_product['id']}", headers=auth_headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    # Modèle de route, pas l'identifiant du produit
+    assert (
+        'http_requests_total{method="GET",route="/products/{product_id}",status="200"}'
+        in text
+    )
+    assert (
+        'http_request_duration_seconds_count{method="POST",route="/products"}' in text
+    )
+    assert (
+        'db_statement_duration_seconds_count{engine="default",operation="INSERT"}'
+        in text
+    )
+    assert 'cache_entries{cache="products"}' in text
+    assert 'db_pool_connections{pool="primary",state="idle"}' in text
@@ -0,0 +1,126 @@
+# tests/test_outbox.py
+import asyncio
+
+from sqlalchemy import event, select
+
+from app.models import OutboxEventModel
+from app.messaging.outbox import OutboxRelay
+from app.messaging.events import PRODUCT_CREATED, PRODUCT_DELETED
+
+
+class FakeBroker:
+    """Broker en mémoire qui enregistre les publications"""
+
+    def __init__(self, fail_types=()):
+        self.is_connected = True
+        self.published = []
+        self.fail_types = fail_types
+
+    async def publish_event(self, event_type, data, event_id=None, timestamp=None):
+        if event_type in self.fail_types:
+            raise RuntimeError("nack")
+        self.published.append((event_type, event_id, data))
+
+    async def publish_many(self, events, ordered=False):
+        errors = []
+        for event in events:
+            try:
+                await self.publish_event(
+                    event["event_type"], event["data"], event_id=event["event_id"]
+                )
+                errors.append(None)
+            except RuntimeError as e:
+                errors.append(e)
+        return errors
+
+
+def outbox_rows(db_session):
+    db_session.expire_all()
+    return db_session.scalars(
+        select(OutboxEventModel).order_by(OutboxEventModel.id)
+    ).all()
+
+
+def test_write_adds_outbox_event(client, auth_headers, db_session, sample_product_data):
+    response = client.post("/products", json=sample_product_data, headers=auth_headers)
+    assert response.status_code == 200
+
+    rows = outbox_rows(db_session)
+    assert len(rows) == 1
+    assert rows[0].event_type == PRODUCT_CREATED
+    assert rows[0].payload["product_id"] == response.json()["id"]
+    assert rows[0].published_at is None
+
+
+def test_relay_publishes_and_marks_sent(
+    client, auth_headers, db_session, async_session_factory, created_product
+):
+    client.delete(f"/products/{created_product['id']}", headers=auth_headers)
+    broker = FakeBroker()
+    relay = OutboxRelay(broker, async_session_factory, batch_size=10)
+
+    assert asyncio.run(relay.relay_once()) == 2
+    assert [p[0] for p in broker.published] == [PRODUCT_CREATED, PRODUCT_DELETED]
+    assert all(row.published_at is not None for row in outbox_rows(db_session))
+    assert asyncio.run(relay.relay_once()) == 0
+
+
+def test_relay_keeps_failed_events_pending(
+    client, auth_headers, db_session, async_session_factory, created_product
+):
+    client.delete(f"/products/{created_product['id']}", headers=auth_headers)
+    relay = OutboxRelay(
+        FakeBroker(fail_types={PRODUCT_DELETED}), async_session_factory, batch_size=10
+    )
+
+    assert asyncio.run(relay.relay_once()) == 1
+    pending = [row for row in outbox_rows(db_session) if row.published_at is None]
+    assert [row.event_type for row in pending] == [PRODUCT_DELETED]
+    assert relay.stats()["failed"] == 1
+
+
+def test_relay_waits_for_broker(client, created_product, async_session_factory):
+    broker = FakeBroker()
+    broker.is_connected = False
+    relay = OutboxRelay(broker, async_session_factory)
+
+    assert asyncio.run(relay.relay_once()) == 0
+    assert broker.published == []
+
+
+def test_update_event_carries_old_values(
+    client, auth_headers, db_session, created_product
+):
+    response = client.put(
+        f"/products/{created_product['id']}",
+        json={"name": "Nouveau nom", "stock": 9},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["stock"] == 9
+
+    event = outbox_rows(db_session)[-1]
+    assert event.payload["changes"] == {"name": "Nouveau nom", "stock": 9}
+    assert event.payload["old_values"]["name"] == created_product["name"]
+    assert event.payload["old_values"]["stock"] == created_product["stock"]
+    assert event.payload["stock"] == 9
+
+
+def test_writes_use_one_product_statement(
+    client, auth_headers, async_session_factory, sample_product_data
+):
+    statements = []
+    engine = async_session_factory.kw["bind"].sync_engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Outbox and change log rows ride along in the same transaction
+        if "outbox_events" not in statement and "product_changes" not in statement:
+            statements.append(statement.split()[0])
+
+    response = client.post("/products", json=sample_product_data, headers=auth_headers)
+    product_id = response.json()["id"]
+    client.put(f"/products/{product_id}", json={"price": 1.5}, headers=auth_headers)
+    client.delete(f"/products/{product_id}", headers=auth_headers)
+
+    assert statements == ["INSERT", "UPDATE", "DELETE"]
@@ -0,0 +1,63 @@
+# tests/test_profiling.py
+from app import profiling
+from app.profiling import RequestProfile
+
+
+def test_requests_are_not_profiled_by_default(client, auth_headers):
+    """Without the header (or without a valid token) nothing is recorded"""
+    response = client.get("/products", headers=auth_headers)
+    assert "x-profile-id" not in response.headers
+
+    response = client.get("/", headers={"X-Profile": "1"})
+    assert "x-profile-id" not in response.headers
+
+
+def test_profile_header_records_sql(client, auth_headers, created_product):
+    """An authenticated X-Profile request returns an id and Server-Timing"""
+    response = client.get(
+        f"/products/{created_product['id']}",
+        headers={**auth_headers, "X-Profile": "1"},
+    )
+    assert response.status_code == 200
+    assert response.headers["server-timing"].startswith("db;dur=")
+    profile_id = response.headers["x-profile-id"]
+
+    report = client.get(f"/debug/profiles/{profile_id}", headers=auth_headers).json()
+    assert report["path"] == f"/products/{created_product['id']}"
+    assert report["status"] == 200
+    assert report["reason"] == "header"
+    assert report["sql_count"] == len(report["sql"]["statements"]) >= 1
+    assert "FROM products" in report["sql"]["statements"][0]["statement"]
+    assert report["samples"]["interval_ms"] > 0
+
+    summaries = client.get("/debug/profiles", headers=auth_headers).json()
+    assert profile_id in [summary["id"] for summary in summaries]
+
+
+def test_sampled_profiles(client, auth_headers, monkeypatch):
+    """A sample rate of 1 profiles every request, even without header"""
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1.0)
+    response = client.get("/")
+    profile_id = response.headers["x-profile-id"]
+    report = client.get(f"/debug/profiles/{profile_id}", headers=auth_headers).json()
+    assert report["reason"] == "sampled"
+
+
+def test_repeated_statements_flag_n_plus_one(monkeypatch):
+    """The same statement executed in a loop is reported as N+1"""
+    monkeypatch.setattr(profiling, "N_PLUS_ONE_THRESHOLD", 3)
+    profile = RequestProfile("GET", "/x", "header")
+    for _ in range(3):
+        profile.record_statement("SELECT * FROM products WHERE id = $1", 0.001)
+    profile.record_statement("SELECT 1", 0.001)
+
+    summary = profile.summary()
+    assert summary["n_plus_one"] is True
+    assert summary["sql_count"] == 4
+    assert profile.repeated_statements() == [
+        {
+            "statement": "SELECT * FROM products WHERE id = $1",
+            "count": 3,
+            "total_ms": 3.0,
+        }
+    ]
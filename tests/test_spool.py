@@ -0,0 +1,146 @@
+# tests/test_spool.py
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from app.messaging.dispatcher import EventDispatcher
+from app.messaging.outbox import OutboxRelay
+from app.messaging.spool import EventSpool, SpoolFull
+from app.messaging.events import PRODUCT_CREATED, PRODUCT_DELETED
+from tests.test_dispatcher import run_dispatcher
+from tests.test_outbox import FakeBroker, outbox_rows
+
+
+def make_events(count, start=0):
+    return [
+        {
+            "event_type": PRODUCT_CREATED,
+            "data": {"product_id": i},
+            "event_id": f"evt-{i}",
+            "timestamp": datetime.now(timezone.utc),
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def test_append_read_commit(tmp_path):
+    spool = EventSpool(str(tmp_path))
+    spool.append(make_events(3))
+
+    records = spool.read(2)
+    assert [event["event_id"] for event, _ in records] == ["evt-0", "evt-1"]
+    assert isinstance(records[0][0]["timestamp"], datetime)
+
+    spool.commit(records[-1][1], len(records))
+    assert [event["event_id"] for event, _ in spool.read(10)] == ["evt-2"]
+
+
+def test_segments_rotate_and_are_deleted_once_replayed(tmp_path):
+    spool = EventSpool(str(tmp_path), segment_bytes=200)
+    for i in range(5):
+        spool.append(make_events(2, start=2 * i))
+    assert spool.stats()["segments"] > 1
+
+    records = spool.read(100)
+    assert [event["event_id"] for event, _ in records] == [
+        f"evt-{i}" for i in range(10)
+    ]
+    spool.commit(records[-1][1], len(records))
+    assert spool.stats()["segments"] == 1
+    assert spool.backlog_bytes == 0
+
+
+def test_recovery_resumes_from_cursor_and_drops_torn_record(tmp_path):
+    spool = EventSpool(str(tmp_path))
+    spool.append(make_events(3))
+    records = spool.read(1)
+    spool.commit(records[0][1], 1)
+    spool.close()
+
+    # Simulate a crash in the middle of a write
+    segment = next(tmp_path.glob("*.spool"))
+    with open(segment, "ab") as f:
+        f.write(b'{"event_type": "product.cre')
+
+    reopened = EventSpool(str(tmp_path))
+    assert [event["event_id"] for event, _ in reopened.read(10)] == [
+        "evt-1",
+        "evt-2",
+    ]
+    reopened.append(make_events(1, start=3))
+    assert len(reopened.read(10)) == 3
+
+
+def test_full_spool_rejects_whole_batch(tmp_path):
+    spool = EventSpool(str(tmp_path), max_bytes=300)
+    spool.append(make_events(1))
+    with pytest.raises(SpoolFull):
+        spool.append(make_events(5))
+    assert spool.stats()["rejected"] == 5
+    assert len(spool.read(10)) == 1
+
+
+def test_relay_spills_while_disconnected_and_replays_in_order(
+    client, auth_headers, db_session, async_session_factory, created_product, tmp_path
+):
+    client.delete(f"/products/{created_product['id']}", headers=auth_headers)
+    broker = FakeBroker()
+    broker.is_connected = False
+    relay = OutboxRelay(broker, async_session_factory, spool=EventSpool(str(tmp_path)))
+
+    assert asyncio.run(relay.relay_once()) == 2
+    # Handed off to the spool: nothing left for the relay
+    assert all(row.published_at is not None for row in outbox_rows(db_session))
+
+    broker.is_connected = True
+    assert asyncio.run(relay.replay_spool()) == 2
+    assert [p[0] for p in broker.published] == [PRODUCT_CREATED, PRODUCT_DELETED]
+    assert relay.spool.backlog_bytes == 0
+
+
+def test_replay_stops_at_first_failure(tmp_path):
+    broker = FakeBroker(fail_types={PRODUCT_DELETED})
+    spool = EventSpool(str(tmp_path))
+    events = make_events(3)
+    events[1]["event_type"] = PRODUCT_DELETED
+    spool.append(events)
+
+    relay = OutboxRelay(broker, None, spool=spool)
+    assert asyncio.run(relay.replay_spool()) == 1
+    assert [event["event_id"] for event, _ in spool.read(10)] == ["evt-1", "evt-2"]
+
+
+def test_replay_is_rate_limited(tmp_path):
+    spool = EventSpool(str(tmp_path))
+    spool.append(make_events(50))
+    relay = OutboxRelay(
+        FakeBroker(), None, batch_size=10, spool=spool, replay_rate=0.001
+    )
+
+    assert asyncio.run(relay.replay_spool()) == 10
+    assert asyncio.run(relay.replay_spool()) == 0
+    assert relay.stats()["spool"]["replayed"] == 10
+
+
+def test_new_events_queue_behind_spool_backlog(
+    client, auth_headers, db_session, async_session_factory, created_product, tmp_path
+):
+    """After reconnecting, new rows go through the spool instead of overtaking it"""
+    spool = EventSpool(str(tmp_path))
+    spool.append(make_events(2))
+    broker = FakeBroker()
+    relay = OutboxRelay(broker, async_session_factory, spool=spool, min_age=60)
+    dispatcher = EventDispatcher(broker, async_session_factory, spool=spool)
+
+    run_dispatcher(async_session_factory, dispatcher)
+    assert broker.published == []
+    assert dispatcher.stats()["deferred"] == 1
+
+    # Spilled despite min_age, then replayed after the older events
+    assert asyncio.run(relay.relay_once()) == 1
+    assert asyncio.run(relay.replay_spool()) == 3
+    assert [p[1] for p in broker.published][:2] == ["evt-0", "evt-1"]
+    assert broker.published[2][0] == PRODUCT_CREATED
+    assert all(row.published_at is not None for row in outbox_rows(db_session))
+    assert spool.backlog_bytes == 0
@@ -0,0 +1,181 @@
+# tests/test_startup.py
+import asyncio
+import io
+import os
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, text
+
+from app.db import Base
+from app.main import app
+from app.messaging.broker import MessageBroker
+from app.startup import StartupTimer
+
+
+def test_liveness_reports_startup_phases(client):
+    """Liveness never touches dependencies and exposes startup timings"""
+    response = client.get("/health/live")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "alive"
+    assert "imported" in data["phases_s"]
+    assert "first_request" in data["phases_s"]
+
+
+def test_readiness_requires_completed_startup(client, monkeypatch):
+    """Not ready before lifespan finished, ready once started with a database"""
+    monkeypatch.delattr(app.state, "started", raising=False)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["checks"]["started"] is False
+
+    monkeypatch.setattr(app.state, "started", True, raising=False)
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    # Broker absent : signalé mais non bloquant par défaut
+    assert response.json()["checks"] == {
+        "started": True,
+        "database": True,
+        "message_broker": False,
+    }
+
+
+def test_startup_timer_keeps_first_mark():
+    """Phases are measured from process start and recorded once"""
+    timer = StartupTimer()
+    timer.mark("ready")
+    first = timer.phases["ready"]
+    timer.mark("ready")
+    assert timer.phases["ready"] == first > 0
+
+
+def test_broker_connects_in_background_with_retries():
+    """Supervision retries failed connections and subscribes once connected"""
+    broker = MessageBroker("amqp://unused", "test")
+    attempts = []
+    subscribed = []
+
+    class Connection:
+        is_closed = False
+
+        def __init__(self):
+            self.connected = asyncio.Event()
+            self.connected.set()
+
+    async def connect(max_retries=5, retry_delay=2.0):
+        attempts.append(max_retries)
+        if len(attempts) < 3:
+            raise ConnectionError("refused")
+        broker.connection = Connection()
+
+    async def on_connected():
+        subscribed.append(True)
+
+    broker.connect = connect
+
+    async def scenario():
+        broker.start(on_connected, retry_delay=0.001, check_interval=0.001)
+        for _ in range(200):
+            if subscribed:
+                break
+            await asyncio.sleep(0.005)
+        broker.connection = None  # close() ne doit plus rien fermer
+        await broker.close()
+
+    asyncio.run(scenario())
+    assert attempts == [1, 1, 1]
+    assert subscribed == [True]
+    assert broker.connect_failures == 2
+    assert broker.connections == 1
+
+
+def alembic_config():
+    config = Config(os.path.join(os.path.dirname(__file__), os.pardir, "alembic.ini"))
+    config.set_main_option(
+        "script_location",
+        os.path.join(os.path.dirname(__file__), os.pardir, "migrations"),
+    )
+    return config
+
+
+def schema_diff(engine):
+    with engine.connect() as connection:
+        return compare_metadata(MigrationContext.configure(connection), Base.metadata)
+
+
+def drop_schema(engine):
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    engine.dispose()
+
+
+def test_migrations_match_models():
+    """alembic upgrade head produces exactly the schema declared by the models"""
+    engine = create_engine(os.getenv("DATABASE_URL"))
+    config = alembic_config()
+    try:
+        command.upgrade(config, "head")
+        assert schema_diff(engine) == []
+        command.downgrade(config, "base")
+    finally:
+        drop_schema(engine)
+
+
+def test_original_database_stamped_0001_upgrades_to_head():
+    """A database created by the first create_all reaches head after stamp 0001"""
+    engine = create_engine(os.getenv("DATABASE_URL"))
+    config = alembic_config()
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    "CREATE TABLE products (id SERIAL PRIMARY KEY, "
+                    "name VARCHAR NOT NULL, price NUMERIC NOT NULL, "
+                    "description TEXT, color VARCHAR, stock INTEGER, "
+                    "created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL)"
+                )
+            )
+            connection.execute(text("CREATE INDEX ix_products_id ON products (id)"))
+            connection.execute(
+                text(
+                    "INSERT INTO products (name, price, created_at) "
+                    "VALUES ('Arabica', 2.5, '2026-01-01 12:00:00')"
+                )
+            )
+
+        command.stamp(config, "0001")
+        command.upgrade(config, "head")
+
+        assert schema_diff(engine) == []
+        with engine.connect() as connection:
+            row = connection.execute(
+                text(
+                    "SELECT created_at AT TIME ZONE 'UTC', updated_at = created_at, "
+                    "version FROM products"
+                )
+            ).one()
+            changes = connection.execute(
+                text("SELECT count(*) FROM product_changes")
+            ).scalar()
+        assert str(row[0]) == "2026-01-01 12:00:00"
+        assert row[1:] == (True, 1)
+        assert changes == 1
+    finally:
+        drop_schema(engine)
+
+
+def test_migrations_generate_offline_sql():
+    """alembic upgrade head --sql works without a database connection"""
+    buffer = io.StringIO()
+    config = alembic_config()
+    config.output_buffer = buffer
+
+    command.upgrade(config, "head", sql=True)
+
+    sql = buffer.getvalue()
+    assert "AT TIME ZONE 'UTC'" in sql
+    assert "version_num='0005'" in sql